@@ -0,0 +1,504 @@
+import asyncio
+import enum
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable, Iterable, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Self
+
+import ollama
+import pandas as pd
+
+from eda.chunking import DEFAULT_MAX_TOKENS
+from eda.language import (
+    DEFAULT_PIPELINE_PROFILE,
+    PipelineProfile,
+    load_model,
+    temporary_tag_caches,
+)
+from eda.llm import (
+    CachedClient,
+    MessageFactory,
+    ModelMetrics,
+    ModelResponseGenerator,
+    model_metrics,
+    reset_model_metrics,
+    temporary_caches,
+    translate_llm,
+)
+from eda.models import (
+    Conversation,
+    ConversationLine,
+    normalise_lines,
+    score_lines,
+    tag_lines,
+)
+from eda.ollama_standin import OllamaStandIn
+from eda.parsing import ConversationParser, Conversations, Participants
+from eda.sentiments import (
+    LexiconScorer,
+    PolarityScores,
+    ScoringBackend,
+    score_texts,
+    temporary_polarity_scores,
+)
+from eda.synthetic import SyntheticCorpus
+from eda.themes import ThemeCheckpoints, classify_themes, load_lod_themes, themes_prompt
+from eda.utils import FOLDER_DIR, KIPASTI_DATA_PATH
+
+
+@dataclass(frozen=True)
+class BenchmarkResult:
+    name: str
+    n_items: int
+    elapsed: float
+
+    def __str__(self) -> str:
+        return (
+            f"{self.name}: {self.n_items} in {self.elapsed:.3f}s "
+            f"({self.items_per_second:.1f}/s, {self.ms_per_item:.3f} ms each)"
+        )
+
+    @property
+    def items_per_second(self) -> float:
+        return self.n_items / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def ms_per_item(self) -> float:
+        return self.elapsed / self.n_items * 1000 if self.n_items else 0.0
+
+
+@dataclass(frozen=True)
+class LLMBenchmarkResult(BenchmarkResult):
+    n_requests: int
+    n_retries: int
+    n_failures: int
+    p50_latency: float
+    p99_latency: float
+
+    def __str__(self) -> str:
+        return (
+            f"{super().__str__()}; {self.n_requests} requests, "
+            f"{self.n_retries} retries, {self.n_failures} failed, "
+            f"p50 {self.p50_latency * 1000:.1f} ms, p99 {self.p99_latency * 1000:.1f} ms"
+        )
+
+    @classmethod
+    def from_metrics(
+        cls, name: str, n_items: int, elapsed: float, metrics: ModelMetrics
+    ) -> Self:
+        # Every request beyond the first of an item retried it, whether after a
+        # transient error or an unusable response
+        return cls(
+            name,
+            n_items,
+            elapsed,
+            metrics.n_requests,
+            metrics.n_requests - n_items,
+            metrics.n_failures,
+            metrics.latency_percentile(50),
+            metrics.latency_percentile(99),
+        )
+
+
+def measure(name: str, func: Callable[[], object], n_items: int = 1) -> BenchmarkResult:
+    start = time.perf_counter()
+    func()
+    return BenchmarkResult(name, n_items, time.perf_counter() - start)
+
+
+def benchmark_import_time(
+    module_names: Iterable[str] = ("eda.language", "eda.models", "eda.parsing"),
+    repeat: int = 3,
+) -> list[BenchmarkResult]:
+    # Every import runs in a fresh interpreter, so nothing is already cached in
+    # `sys.modules`; the best of `repeat` runs is kept
+    results = []
+    for module_name in module_names:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            subprocess.run(
+                [sys.executable, "-c", f"import {module_name}"],
+                cwd=FOLDER_DIR,
+                check=True,
+            )
+            timings.append(time.perf_counter() - start)
+        results.append(BenchmarkResult(f"import {module_name}", 1, min(timings)))
+    return results
+
+
+def benchmark_pipeline_profiles(
+    texts: Sequence[str], profiles: Iterable[PipelineProfile] = tuple(PipelineProfile)
+) -> list[BenchmarkResult]:
+    # The tag cache is bypassed so every line goes through the model
+    results = []
+    for profile in profiles:
+        load_model.cache_clear()
+        results.append(measure(f"load {profile.name}", lambda: load_model(profile)))
+
+        nlp = load_model(profile)
+        results.append(
+            measure(
+                f"tag {profile.name} per line",
+                lambda: [nlp(text) for text in texts],
+                len(texts),
+            )
+        )
+    load_model.cache_clear()
+    return results
+
+
+def benchmark_sentiment_backends(
+    texts: Sequence[str],
+    backends: Iterable[ScoringBackend] = tuple(ScoringBackend),
+    max_workers: Optional[int] = None,
+    chunk_size: int = 256,
+) -> list[BenchmarkResult]:
+    # The scores store is bypassed so every text is scored by every backend,
+    # and all of them must agree for the timings to be comparable
+    results = []
+    scores_by_backend = {}
+    for backend in backends:
+        scores_by_backend[backend] = scores = []
+        results.append(
+            measure(
+                f"score {backend}",
+                lambda: scores.extend(
+                    score_texts(
+                        texts,
+                        backend=backend,
+                        max_workers=max_workers,
+                        chunk_size=chunk_size,
+                    )
+                ),
+                len(texts),
+            )
+        )
+
+    scores, *other_scores = scores_by_backend.values()
+    if any(scores != other for other in other_scores):
+        raise ValueError("Sentiment backends scored the texts differently")
+    return results
+
+
+def lexicon_scorer_mismatches(
+    texts: Sequence[str], scores: Optional[Sequence[PolarityScores]] = None
+) -> list[tuple[str, PolarityScores, PolarityScores]]:
+    # Texts (if any) that the lexicon scorer scores differently from the VADER
+    # analyser that is installed, with both scores
+    if scores is None:
+        scores = LexiconScorer()(texts)
+    return [
+        (text, text_scores, expected_scores)
+        for text, text_scores, expected_scores in zip(
+            texts, scores, score_texts(texts), strict=True
+        )
+        if text_scores != expected_scores
+    ]
+
+
+def _word_attributes(line: ConversationLine, name: str) -> pd.Series:
+    # As a series, where missing values (NaN) equal each other
+    return pd.Series(
+        [getattr(word, name) for word in line.normalised_words], dtype=object
+    )
+
+
+def conversation_differences(
+    conversation: Conversation, other: Conversation
+) -> list[str]:
+    # What (if anything) differs between two reads of the same conversation
+    if conversation.code != other.code:
+        return [f"codes {conversation.code!r} and {other.code!r}"]
+    if len(conversation) != len(other):
+        return [f"{conversation.code}: line counts"]
+
+    differences = []
+    if conversation.participants != other.participants:
+        differences.append(f"{conversation.code}: participants")
+    for line, other_line in zip(conversation, other, strict=True):
+        for name, is_same in (
+            ("tu_id", line.tu_id == other_line.tu_id),
+            ("participant", line.participant == other_line.participant),
+            ("text", line.text == other_line.text),
+            ("words", line.normalised_words == other_line.normalised_words),
+            *(
+                (
+                    name,
+                    _word_attributes(line, name).equals(
+                        _word_attributes(other_line, name)
+                    ),
+                )
+                for name in ("word_type", "variation")
+            ),
+            (
+                "jefferson_masks",
+                [word.jefferson_mask for word in line.normalised_words]
+                == [word.jefferson_mask for word in other_line.normalised_words],
+            ),
+        ):
+            if not is_same:
+                differences.append(f"{conversation.code} line {line.tu_id}: {name}")
+    if not conversation.tokens.equals(other.tokens):
+        differences.append(f"{conversation.code}: tokens")
+    return differences
+
+
+def benchmark_conversation_parsing(
+    participants: Participants,
+    codes: Sequence[str],
+    data_path: Path = KIPASTI_DATA_PATH,
+) -> list[BenchmarkResult]:
+    # Both parse paths must produce the same conversations for the timings to
+    # be comparable
+    parser = ConversationParser(participants, data_path)
+    results = []
+    conversations_by_path = {}
+    for vectorized in (False, True):
+        name = "vectorized" if vectorized else "row by row"
+        conversations = []
+        results.append(
+            measure(
+                f"parse {name}",
+                lambda: conversations.extend(
+                    parser.parse_conversation(code, vectorized=vectorized)
+                    for code in codes
+                ),
+                len(codes),
+            )
+        )
+        conversations_by_path[vectorized] = conversations
+
+    for conversation, other in zip(*conversations_by_path.values(), strict=True):
+        if differences := conversation_differences(conversation, other):
+            raise ValueError(f"Parse paths differ in {', '.join(differences[:5])}")
+    return results
+
+
+def benchmark_llm_pipeline(
+    conversations: Sequence[Conversation],
+    *,
+    n_texts: int = 200,
+    max_in_flight: int = 4,
+    latency: float = 0.02,
+    jitter: float = 0.01,
+    error_rate: float = 0.05,
+    invalid_json_rate: float = 0.1,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+) -> list[LLMBenchmarkResult]:
+    # Every stage runs against a local stand-in server with empty caches, so
+    # each item costs at least one request
+    texts = list(
+        dict.fromkeys(
+            line.text for conversation in conversations for line in conversation
+        )
+    )[:n_texts]
+    themes = load_lod_themes()
+    results = []
+    reset_model_metrics()
+    with (
+        temporary_caches() as path,
+        OllamaStandIn(
+            latency=latency,
+            jitter=jitter,
+            error_rate=error_rate,
+            invalid_json_rate=invalid_json_rate,
+        ) as standin,
+    ):
+        client = CachedClient(standin.host)
+        metrics = model_metrics("translate_llm")
+
+        def translate_texts():
+            for text in texts:
+                try:
+                    translate_llm(text, "translate_llm", client=client)
+                except ollama.ResponseError:
+                    metrics.n_failures += 1
+
+        start = time.perf_counter()
+        translate_texts()
+        results.append(
+            LLMBenchmarkResult.from_metrics(
+                "translate_llm", len(texts), time.perf_counter() - start, metrics
+            )
+        )
+
+        async def generate_responses():
+            factory = MessageFactory("Repeat the message.")
+            async with asyncio.TaskGroup() as task_group:
+                response_generator = ModelResponseGenerator(
+                    model_name="generator",
+                    host=standin.host,
+                    max_in_flight=max_in_flight,
+                    backoff=0.01,
+                )
+                task_group.create_task(response_generator.run())
+
+                async def enqueue_texts():
+                    for text in texts:
+                        await response_generator.enqueue(factory.create_message(text))
+                    await response_generator.enqueue(None)
+
+                task_group.create_task(enqueue_texts())
+                async for _ in response_generator:
+                    pass
+
+        start = time.perf_counter()
+        asyncio.run(generate_responses())
+        results.append(
+            LLMBenchmarkResult.from_metrics(
+                f"generator x{max_in_flight}",
+                len(texts),
+                time.perf_counter() - start,
+                model_metrics("generator"),
+            )
+        )
+
+        report = asyncio.run(
+            classify_themes(
+                conversations,
+                prompt=themes_prompt(themes),
+                themes=themes,
+                model_name="themes",
+                max_tokens=max_tokens,
+                checkpoints=ThemeCheckpoints(path / "checkpoints.jsonl"),
+                output_path=path / "themes.json",
+                host=standin.host,
+                max_in_flight=max_in_flight,
+                backoff=0.01,
+            )
+        )
+        results.append(
+            LLMBenchmarkResult.from_metrics(
+                f"themes x{max_in_flight}",
+                report.n_messages,
+                report.elapsed,
+                model_metrics("themes"),
+            )
+        )
+    return results
+
+
+class CorpusStage(enum.StrEnum):
+    PARSE = "parse"
+    NORMALISATION = "normalisation"
+    SENTIMENT = "sentiment"
+    TAGGING = "tagging"
+    PROSODY = "prosody"
+    EXPORT = "export"
+
+
+def export_tables(
+    conversations: Conversations, path: Path, *, valid_sentiments: bool = False
+):
+    # Like the notebooks, which export the tables behind the charts as JSON
+    tables = {
+        "dialect_word_counts": conversations.dialect_word_counts(),
+        "prosodic_frequencies": conversations.prosodic_frequencies(
+            valid_sentiments=valid_sentiments
+        ),
+    }
+    for name, table in tables.items():
+        with path.joinpath(f"{name}.json").open("w") as fp:
+            json.dump(table.to_dict("index"), fp, ensure_ascii=False)
+
+
+def benchmark_corpus(
+    corpus: SyntheticCorpus,
+    stages: Iterable[CorpusStage] = tuple(CorpusStage),
+    *,
+    processes: bool = False,
+    max_workers: Optional[int] = None,
+    sentiment_backend: ScoringBackend = ScoringBackend.LEXICON,
+    profile: PipelineProfile = DEFAULT_PIPELINE_PROFILE,
+    n_process: int = 1,
+) -> list[BenchmarkResult]:
+    # Runs the whole pipeline over a corpus written by `write_synthetic_corpus`,
+    # with empty tag and scores caches so every line is tagged and scored. The
+    # corpus is always parsed, since the other stages need it, but only timed
+    # when its stage is selected.
+    stages = frozenset(stages)
+    results = []
+    with (
+        temporary_tag_caches(),
+        temporary_polarity_scores(),
+        tempfile.TemporaryDirectory() as directory,
+    ):
+        path = Path(directory)
+        participants = Participants(corpus.metadata_path)
+        conversations = Conversations(participants, corpus.data_path)
+        result = measure(
+            "parse processes" if processes else "parse",
+            lambda: conversations.read_all(
+                processes=processes, max_workers=max_workers
+            ),
+            corpus.n_conversations,
+        )
+        if CorpusStage.PARSE in stages:
+            results.append(result)
+        lines = [line for conversation in conversations for line in conversation]
+
+        if CorpusStage.NORMALISATION in stages:
+            results.append(
+                measure("normalise", lambda: normalise_lines(lines), len(lines))
+            )
+        if CorpusStage.SENTIMENT in stages:
+            results.append(
+                measure(
+                    f"score {sentiment_backend}",
+                    lambda: score_lines(
+                        lines, backend=sentiment_backend, max_workers=max_workers
+                    ),
+                    len(lines),
+                )
+            )
+        if CorpusStage.TAGGING in stages:
+            results.append(
+                measure(
+                    f"tag {profile.name}",
+                    lambda: tag_lines(lines, profile=profile, n_process=n_process),
+                    len(lines),
+                )
+            )
+        if CorpusStage.PROSODY in stages:
+            results.append(
+                measure(
+                    "prosody",
+                    lambda: [
+                        conversation.load_prosodic() for conversation in conversations
+                    ],
+                    len(lines),
+                )
+            )
+
+        if CorpusStage.EXPORT in stages:
+            snapshot_path = path / "corpus.snapshot"
+            results.extend((
+                measure(
+                    "export tables",
+                    lambda: export_tables(
+                        conversations,
+                        path,
+                        valid_sentiments=CorpusStage.SENTIMENT in stages,
+                    ),
+                    len(lines),
+                ),
+                measure(
+                    "save snapshot",
+                    lambda: conversations.save_snapshot(snapshot_path),
+                    corpus.n_conversations,
+                ),
+                measure(
+                    "load snapshot",
+                    lambda: Conversations(participants, corpus.data_path).load_snapshot(
+                        snapshot_path
+                    ),
+                    corpus.n_conversations,
+                ),
+            ))
+    return results
@@ -0,0 +1,168 @@
+import hashlib
+import itertools
+import math
+import re
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, replace
+from functools import cached_property
+from typing import Final
+
+from eda.models import Conversation, ConversationLine
+
+type TokenCounter = Callable[[str], int]
+
+# Mistral's tokenizer splits Italian conversation text into about one token per
+# 3.5 characters
+_CHARS_PER_TOKEN: Final = 3.5
+
+DEFAULT_MAX_TOKENS: Final = 1024
+
+_WORD_PIECE_PATTERN: Final = re.compile(r"\w+")
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / _CHARS_PER_TOKEN)
+
+
+@dataclass(frozen=True)
+class ThemeChunk:
+    conversation_code: str
+    index: int
+    text: str
+    lemmas: tuple[str, ...]
+    n_tokens: int = 0
+    is_whole_conversation: bool = False
+
+    @cached_property
+    def hash(self) -> str:
+        return hashlib.sha256(self.text.encode(encoding="utf-8")).hexdigest()
+
+
+def _line_words_and_lemmas(line: ConversationLine) -> tuple[list[str], list[list[str]]]:
+    # The lemmas of each word of the line, so that a line split into parts keeps
+    # every lemma with its word. Stopwords aren't tagged and the tagger splits
+    # elisions and the like off words, so each tagged token goes to the first
+    # word from the previous token's that is, or is split into, that token (or
+    # stays with the previous token's word if there is none).
+    words = list(map(str, line.normalised_words))
+    lemmas: list[list[str]] = [[] for _ in words]
+    if not words:
+        return words, lemmas
+
+    word_pieces = [{word, *_WORD_PIECE_PATTERN.findall(word)} for word in words]
+    word_index = 0
+    for tagged_word in line.tagged:
+        word_index = next(
+            (i for i in range(word_index, len(words)) if tagged_word in word_pieces[i]),
+            word_index,
+        )
+        lemmas[word_index].append(tagged_word.lemma)
+    return words, lemmas
+
+
+def conversation_chunks(
+    conversation: Conversation,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    *,
+    count_tokens: TokenCounter = estimate_tokens,
+) -> list[ThemeChunk]:
+    # Whole lines are packed into chunks of at most `max_tokens` tokens, one
+    # line per row, so no turn is split unless it doesn't fit in a chunk alone
+    chunks = []
+    rows: list[str] = []
+    lemmas: list[str] = []
+    n_tokens = 0
+
+    def flush():
+        nonlocal n_tokens
+        if rows:
+            chunks.append(
+                ThemeChunk(
+                    conversation.code,
+                    len(chunks),
+                    "\n".join(rows),
+                    tuple(filter(None, lemmas)),
+                    n_tokens,
+                )
+            )
+        rows.clear()
+        lemmas.clear()
+        n_tokens = 0
+
+    for line in conversation:
+        line_words, line_lemmas = _line_words_and_lemmas(line)
+        if not line_words:
+            continue
+
+        for words, part_lemmas in _fitting_parts(
+            line_words, line_lemmas, max_tokens, count_tokens
+        ):
+            row = " ".join(words)
+            # Rows are joined by a newline, which counts as one more token
+            row_tokens = count_tokens(row) + bool(rows)
+            if n_tokens + row_tokens > max_tokens:
+                flush()
+                row_tokens = count_tokens(row)
+            rows.append(row)
+            lemmas.extend(itertools.chain.from_iterable(part_lemmas))
+            n_tokens += row_tokens
+    flush()
+    if len(chunks) == 1:
+        chunks[0] = replace(chunks[0], is_whole_conversation=True)
+    return chunks
+
+
+def _fitting_parts(
+    words: list[str],
+    lemmas: list[list[str]],
+    max_tokens: int,
+    count_tokens: TokenCounter,
+) -> Iterable[tuple[list[str], list[list[str]]]]:
+    if count_tokens(" ".join(words)) <= max_tokens:
+        yield words, lemmas
+        return
+
+    start = 0
+    while start < len(words):
+        end = start + 1
+        while end < len(words) and (
+            count_tokens(" ".join(words[start : end + 1])) <= max_tokens
+        ):
+            end += 1
+        yield words[start:end], lemmas[start:end]
+        start = end
+
+
+def pack_chunks(
+    chunks: Iterable[ThemeChunk],
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    *,
+    merge_conversations: bool = False,
+) -> list[tuple[ThemeChunk, ...]]:
+    # Groups chunks into requests. With `merge_conversations`, a conversation
+    # that fits in a single chunk shares its request with other such
+    # conversations while the budget allows, and the themes of the request are
+    # given to all of them, whatever their generation; any other chunk is sent
+    # alone.
+    packs = []
+    pack: list[ThemeChunk] = []
+    n_tokens = 0
+    for chunk in chunks:
+        if not merge_conversations or not chunk.is_whole_conversation:
+            packs.append((chunk,))
+            continue
+
+        # Conversations are separated by a blank line, counted as one token
+        if pack and n_tokens + 1 + chunk.n_tokens > max_tokens:
+            packs.append(tuple(pack))
+            pack.clear()
+            n_tokens = 0
+        n_tokens += chunk.n_tokens + bool(pack)
+        pack.append(chunk)
+    if pack:
+        packs.append(tuple(pack))
+    return packs
+
+
+def pack_text(pack: Iterable[ThemeChunk]) -> str:
+    return "\n\n".join(chunk.text for chunk in pack)
@@ -1,10 +1,31 @@
-from typing import Optional, Self, final
+import atexit
+import enum
+import hashlib
+import importlib.metadata
+import pickle
+import sys
+import tempfile
+import threading
+from array import array
+from collections.abc import Generator, Iterable, Iterator
+from contextlib import contextmanager
+from functools import cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Final, Optional, Self, cast, final
 
-import spacy
-from nltk.corpus import stopwords
+from eda.utils import FOLDER_DIR, write_atomic
 
-nlp = spacy.load("it_core_news_sm")
-italian_stopwords = frozenset(stopwords.words("italian"))
+if TYPE_CHECKING:
+    from spacy.language import Language
+    from spacy.tokens import Doc
+
+MODEL_NAME = "it_core_news_sm"
+TAGS_PATH = FOLDER_DIR / "tags"
+
+_TAG_CACHE_FORMAT_VERSION = 1
+# Each tagged word is packed as the string ids of its text, lemma, POS and
+# entity type
+_N_TAGGED_FIELDS = 4
 
 # Obtained from https://universaldependencies.org/u/pos/
 # and modified
@@ -27,6 +48,44 @@ _POS_NAMES = {
 }
 
 
+class PipelineProfile(enum.Enum):
+    # Each profile lists the pipeline components that are never loaded. None of
+    # the excluded components change the text, lemma, POS or entity type of a
+    # token, so every profile but LEMMA_POS tags exactly like FULL.
+    FULL = ()
+    TAGGING = ("parser",)
+    LEMMA_POS = ("parser", "ner")
+
+    @property
+    def excluded_components(self) -> tuple[str, ...]:
+        return self.value
+
+
+DEFAULT_PIPELINE_PROFILE = PipelineProfile.TAGGING
+
+
+@cache
+def load_model(profile: PipelineProfile = DEFAULT_PIPELINE_PROFILE) -> "Language":
+    import spacy
+
+    return spacy.load(MODEL_NAME, exclude=list(profile.excluded_components))
+
+
+@cache
+def italian_stopwords() -> frozenset[str]:
+    from nltk.corpus import stopwords
+
+    return frozenset(stopwords.words("italian"))
+
+
+def __getattr__(name: str) -> Any:
+    # Kept so that `eda.language.nlp` still works, without loading the model
+    # when the module is imported
+    if name == "nlp":
+        return load_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 @final
 class TaggedText(str):
     _lemma: str
@@ -55,6 +114,9 @@ class TaggedText(str):
     def __str__(self) -> str:
         return super().__str__()
 
+    def __reduce__(self) -> tuple[Any, ...]:
+        return (self.__class__, (str(self), self._lemma, self._pos, self._entity_type))
+
     @property
     def lemma(self) -> str:
         return self._lemma
@@ -72,13 +134,13 @@ class TaggedText(str):
         return self._entity_type
 
 
-def tag(text: str, *, include_stopwords: bool = False) -> list[TaggedText]:
-    doc = nlp(text)
+def _tagged_from_doc(doc: "Doc", include_stopwords: bool) -> list[TaggedText]:
+    stopwords = italian_stopwords()
     tagged = []
     for token in doc:
         if not token.is_alpha or token.pos_ == "PUNCT":
             continue
-        if not include_stopwords and (token.is_stop or token.text in italian_stopwords):
+        if not include_stopwords and (token.is_stop or token.text in stopwords):
             continue
 
         tagged_word = TaggedText(token.text, token.lemma_, token.pos_, token.ent_type_)
@@ -86,30 +148,369 @@ def tag(text: str, *, include_stopwords: bool = False) -> list[TaggedText]:
     return tagged
 
 
+class _TagCache:
+    # Tagged lines are stored per model and stopword setting, keyed by a hash of
+    # the text. Strings are interned into a shared table, so each line takes
+    # four integers per tagged word.
+    def __init__(
+        self,
+        model_name: str,
+        profile: PipelineProfile,
+        include_stopwords: bool,
+        directory: Path = TAGS_PATH,
+    ):
+        self._model_name = model_name
+        self._directory = directory
+        self._profile = profile
+        self._include_stopwords = include_stopwords
+        self._lock = threading.RLock()
+        self._strings: Optional[list[str]] = None
+        self._string_ids: dict[str, int] = {}
+        self._entries: dict[bytes, array] = {}
+        self._dirty = False
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._load()
+            return len(self._entries)
+
+    def __contains__(self, text: str) -> bool:
+        with self._lock:
+            self._load()
+            return self._encode_key(text) in self._entries
+
+    @property
+    def path(self) -> Path:
+        profile_name = self._profile.name.lower()
+        stopwords_name = "stopwords" if self._include_stopwords else "no-stopwords"
+        return (
+            self._directory
+            / f"tags_{self._model_name}_{profile_name}_{stopwords_name}.pickle"
+        )
+
+    def get(self, text: str) -> Optional[list[TaggedText]]:
+        with self._lock:
+            self._load()
+            if (packed := self._entries.get(self._encode_key(text))) is None:
+                return None
+            strings = cast(list[str], self._strings)
+            return [
+                TaggedText(
+                    strings[packed[i]],
+                    strings[packed[i + 1]],
+                    strings[packed[i + 2]],
+                    strings[packed[i + 3]],
+                )
+                for i in range(0, len(packed), _N_TAGGED_FIELDS)
+            ]
+
+    def put(self, text: str, tagged: list[TaggedText]):
+        with self._lock:
+            self._load()
+            packed = array("I")
+            for word in tagged:
+                packed.extend((
+                    self._string_id(str(word)),
+                    self._string_id(word.lemma),
+                    self._string_id(word.pos),
+                    self._string_id(word.entity_type or ""),
+                ))
+            self._entries[self._encode_key(text)] = packed
+            self._dirty = True
+
+    def flush(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {
+                "version": _TAG_CACHE_FORMAT_VERSION,
+                "strings": self._strings,
+                "entries": {
+                    key: packed.tobytes() for key, packed in self._entries.items()
+                },
+            }
+            write_atomic(
+                self.path, pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+            )
+            self._dirty = False
+
+    @staticmethod
+    def _encode_key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def _string_id(self, value: str) -> int:
+        if (string_id := self._string_ids.get(value)) is None:
+            strings = cast(list[str], self._strings)
+            self._string_ids[value] = string_id = len(strings)
+            strings.append(value)
+        return string_id
+
+    def _load(self):
+        if self._strings is not None:
+            return
+
+        self._strings = [""]
+        if self.path.exists():
+            with self.path.open("rb") as fp:
+                try:
+                    data = pickle.load(fp)
+                except (pickle.UnpicklingError, EOFError):
+                    data = None
+
+            if data is not None and data["version"] == _TAG_CACHE_FORMAT_VERSION:
+                self._strings = data["strings"]
+                for key, raw_packed in data["entries"].items():
+                    packed = array("I")
+                    packed.frombytes(raw_packed)
+                    self._entries[key] = packed
+        self._string_ids = {value: i for i, value in enumerate(self._strings)}
+
+
+_tag_caches: Final[dict[tuple[PipelineProfile, bool], _TagCache]] = {}
+_tag_caches_lock: Final = threading.Lock()
+_tags_path = TAGS_PATH
+_tag_caches_read_only = False
+
+
+def _model_name() -> str:
+    # The installed package version is used so the cache can be looked up
+    # without loading the model
+    return f"{MODEL_NAME}-{importlib.metadata.version(MODEL_NAME)}"
+
+
+def _tag_cache(profile: PipelineProfile, include_stopwords: bool) -> _TagCache:
+    key = (profile, include_stopwords)
+    with _tag_caches_lock:
+        if (tag_cache := _tag_caches.get(key)) is None:
+            _tag_caches[key] = tag_cache = _TagCache(
+                _model_name(), profile, include_stopwords, _tags_path
+            )
+        return tag_cache
+
+
+def flush_tag_cache():
+    if _tag_caches_read_only:
+        return
+    with _tag_caches_lock:
+        caches = list(_tag_caches.values())
+    for tag_cache in caches:
+        tag_cache.flush()
+
+
+atexit.register(flush_tag_cache)
+
+
+def make_tag_caches_read_only():
+    # For worker processes, which send their tags back to be stored by the
+    # parent. Each of them flushing would rewrite the whole cache file with
+    # only its own tags.
+    global _tag_caches_read_only
+    _tag_caches_read_only = True
+
+
+def store_tags(
+    tagged_texts: Iterable[tuple[str, list[TaggedText]]],
+    *,
+    include_stopwords: bool = False,
+    profile: PipelineProfile = DEFAULT_PIPELINE_PROFILE,
+):
+    tag_cache = _tag_cache(profile, include_stopwords)
+    for text, tagged in tagged_texts:
+        if text not in tag_cache:
+            tag_cache.put(text, tagged)
+
+
+@contextmanager
+def temporary_tag_caches() -> Generator[Path]:
+    # Swaps the tag caches for empty ones in a temporary directory, so every
+    # line goes through the model without touching the real caches
+    global _tags_path
+    flush_tag_cache()
+    with _tag_caches_lock:
+        saved = (_tags_path, dict(_tag_caches))
+    with tempfile.TemporaryDirectory() as directory:
+        with _tag_caches_lock:
+            _tags_path = Path(directory)
+            _tag_caches.clear()
+        try:
+            yield _tags_path
+        finally:
+            with _tag_caches_lock:
+                _tags_path, caches = saved
+                _tag_caches.clear()
+                _tag_caches.update(caches)
+
+
+def tag(
+    text: str,
+    *,
+    include_stopwords: bool = False,
+    profile: PipelineProfile = DEFAULT_PIPELINE_PROFILE,
+) -> list[TaggedText]:
+    tag_cache = _tag_cache(profile, include_stopwords)
+    if (tagged := tag_cache.get(text)) is not None:
+        return tagged
+
+    tagged = _tagged_from_doc(load_model(profile)(text), include_stopwords)
+    tag_cache.put(text, tagged)
+    return tagged
+
+
+def has_cached_tags(
+    text: str,
+    *,
+    include_stopwords: bool = False,
+    profile: PipelineProfile = DEFAULT_PIPELINE_PROFILE,
+) -> bool:
+    return text in _tag_cache(profile, include_stopwords)
+
+
+def tag_many(
+    texts: Iterable[str],
+    *,
+    include_stopwords: bool = False,
+    profile: PipelineProfile = DEFAULT_PIPELINE_PROFILE,
+    batch_size: int = 256,
+    n_process: int = 1,
+) -> Iterator[list[TaggedText]]:
+    # Results are yielded in the same order as the texts, even with several
+    # processes, so they can be zipped back onto whatever produced the texts.
+    # Only texts missing from the cache go through the model, each of them once.
+    tag_cache = _tag_cache(profile, include_stopwords)
+    texts = list(texts)
+    missing_texts = [text for text in dict.fromkeys(texts) if text not in tag_cache]
+    if missing_texts:
+        docs = iter(
+            load_model(profile).pipe(
+                missing_texts, batch_size=batch_size, n_process=n_process
+            )
+        )
+    else:
+        docs = iter(())
+
+    for text in texts:
+        if (tagged := tag_cache.get(text)) is None:
+            tagged = _tagged_from_doc(next(docs), include_stopwords)
+            tag_cache.put(text, tagged)
+        yield tagged
+
+
+DIALECT_VARIATIONS = frozenset(("some", "all"))
+LINGUISTIC_WORD_TYPE = "linguistic"
+NO_ISO_CODE_FEATURE = "Language=NO_ISO_CODE"
+
+
+class FeatureVocabulary:
+    # Interns Jefferson features to bit positions, so that the features of a word
+    # can be stored as a single integer mask, as wide as the vocabulary needs
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._features: list[str] = []
+        self._indices: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._features)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._features[:])
+
+    def bit(self, feature: str) -> int:
+        if (index := self._indices.get(feature)) is None:
+            with self._lock:
+                if (index := self._indices.get(feature)) is None:
+                    index = len(self._features)
+                    self._features.append(feature)
+                    self._indices[feature] = index
+        return 1 << index
+
+    def encode(self, features: Iterable[str]) -> int:
+        mask = 0
+        for feature in features:
+            mask |= self.bit(feature)
+        return mask
+
+    def decode(self, mask: int) -> list[str]:
+        return [feature for i, feature in enumerate(self._features) if mask & (1 << i)]
+
+
+jefferson_features_vocabulary: Final = FeatureVocabulary()
+
+
+_DIALECT_FLAG = 1
+_STRICT_DIALECT_FLAG = 2
+
+
 @final
 class AttributedWord(str):
+    # Words are by far the most numerous objects in the corpus, so they keep
+    # no __dict__ and their features are stored as an interned bitmask
+    __slots__ = ("_word_type", "_variation", "_jefferson_mask", "_dialect_flags")
+
     _word_type: str
-    _jefferson_features: list[str]
     _variation: str
+    _jefferson_mask: int
+    _dialect_flags: int
 
     def __new__(
-        cls, value: str, word_type: str, jefferson_features: list[str], variation: str
+        cls,
+        value: str,
+        word_type: str,
+        jefferson_features: Iterable[str] | int,
+        variation: str,
     ) -> Self:
         self = super().__new__(cls, value)
-        self._jefferson_features = jefferson_features
-        self._variation = variation
-        self._word_type = word_type
+        if isinstance(jefferson_features, int):
+            self._jefferson_mask = jefferson_features
+        else:
+            self._jefferson_mask = jefferson_features_vocabulary.encode(
+                jefferson_features
+            )
+        # Missing values (NaN in the .vert.tsv files) are kept as they are
+        self._variation = (
+            sys.intern(variation) if isinstance(variation, str) else variation
+        )
+        self._word_type = (
+            sys.intern(word_type) if isinstance(word_type, str) else word_type
+        )
+
+        dialect_flags = 0
+        if variation in DIALECT_VARIATIONS:
+            dialect_flags |= _DIALECT_FLAG
+            if self._jefferson_mask & jefferson_features_vocabulary.bit(
+                NO_ISO_CODE_FEATURE
+            ):
+                dialect_flags |= _STRICT_DIALECT_FLAG
+        self._dialect_flags = dialect_flags
         return self
 
+    def __reduce__(self) -> tuple[Any, ...]:
+        return (
+            self.__class__,
+            (str(self), self._word_type, self.jefferson_features, self._variation),
+        )
+
     @property
     def word_type(self) -> str:
         return self._word_type
 
+    @property
+    def variation(self) -> str:
+        return self._variation
+
+    @property
+    def jefferson_mask(self) -> int:
+        return self._jefferson_mask
+
+    @property
+    def jefferson_features(self) -> list[str]:
+        return jefferson_features_vocabulary.decode(self._jefferson_mask)
+
     @property
     def is_linguistic(self) -> bool:
-        return self._word_type == "linguistic"
+        return self._word_type == LINGUISTIC_WORD_TYPE
 
     def is_dialect(self, strict: bool = True) -> bool:
-        correct_variation = self._variation in ("some", "all")
-        word_has_no_iso_code = "Language=NO_ISO_CODE" in self._jefferson_features
-        return correct_variation and (not strict or word_has_no_iso_code)
+        return bool(
+            self._dialect_flags & (_STRICT_DIALECT_FLAG if strict else _DIALECT_FLAG)
+        )
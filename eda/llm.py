@@ -1,29 +1,522 @@
 import asyncio
+import atexit
+import concurrent.futures
+import hashlib
+import json
+import math
 import re
-from dataclasses import dataclass
-from typing import Any, Final, Optional
+import tempfile
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from collections.abc import AsyncIterator, Generator, Iterable, Sequence
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Final, Optional, cast
 
 import ollama
 
-from eda.utils import PROMPTS_PATH
+from eda.utils import FOLDER_DIR, PROMPTS_PATH, write_atomic
 
-_DEFAULT_MODEL = "mistral:latest"
+DEFAULT_MODEL = "mistral:latest"
 
 _ANNOTATED_TRANSLATION_PATTERN = re.compile(r"[\[(].+[\])]$")
+_UNSAFE_FILE_NAME_PATTERN = re.compile(r"[^\w.-]")
+
+TRANSLATIONS_PATH = FOLDER_DIR / "translations"
+RESPONSES_PATH = FOLDER_DIR / "responses"
 
 _translate_prompt: Final = PROMPTS_PATH.joinpath("translate.txt").read_text()
-_client: Final = ollama.Client()
+_translate_batch_prompt: Final = PROMPTS_PATH.joinpath(
+    "translate_batch.txt"
+).read_text()
 
 
-def translate_llm(text: str, model_name: str = _DEFAULT_MODEL) -> str:
-    response = _client.chat(
-        model_name, messages=MessageFactory(_translate_prompt).create_message(text).to_list()
+class ResponseCache:
+    # Chat responses keyed by the hash of the model name, the full message list
+    # and the sampling options, capped at `max_entries` with the least recently
+    # used evicted first. The cache is persisted as an append-only log in which
+    # a record with content adds a response, a deleted one discards it and any
+    # other only marks it as used; the log is rewritten with the live responses
+    # once it holds twice as many records. Uses and discards are only kept in
+    # memory until the next response is added or the cache is flushed, so
+    # lookups never write.
+    def __init__(
+        self, path: Path = RESPONSES_PATH / "responses.jsonl", max_entries: int = 50_000
+    ):
+        self._path = path
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: Optional[OrderedDict[str, str]] = None
+        self._unwritten: OrderedDict[str, dict[str, Any]] = OrderedDict()
+        self._n_records = 0
+        self.n_hits = 0
+        self.n_misses = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._load())
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    @staticmethod
+    def key(model: str, messages: Any, format: Any = None, options: Any = None) -> str:
+        request = {
+            "model": model,
+            "messages": [_dump_model(message) for message in messages or ()],
+            "format": format or None,
+            "options": _dump_model(options) or None,
+        }
+        return _hash_text(json.dumps(request, sort_keys=True, ensure_ascii=False))
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entries = self._load()
+            if (content := entries.get(key)) is None:
+                self.n_misses += 1
+                return None
+            self.n_hits += 1
+            entries.move_to_end(key)
+            self._keep_unwritten({"key": key})
+            return content
+
+    def put(self, key: str, content: str):
+        with self._lock:
+            entries = self._load()
+            entries[key] = content
+            entries.move_to_end(key)
+            while len(entries) > self._max_entries:
+                entries.popitem(last=False)
+            self._keep_unwritten({"key": key, "content": content})
+            self._write_unwritten()
+
+    def discard(self, key: str):
+        with self._lock:
+            if self._load().pop(key, None) is not None:
+                self._keep_unwritten({"key": key, "deleted": True})
+
+    def flush(self):
+        with self._lock:
+            self._write_unwritten()
+
+    def clear(self):
+        with self._lock:
+            self._entries = OrderedDict()
+            self._unwritten.clear()
+            self._n_records = 0
+            self._path.unlink(missing_ok=True)
+
+    def _keep_unwritten(self, record: dict[str, Any]):
+        # Only the last record of a key matters once the log is read back
+        self._unwritten.pop(record["key"], None)
+        self._unwritten[record["key"]] = record
+
+    def _write_unwritten(self):
+        if not self._unwritten:
+            return
+
+        records = list(self._unwritten.values())
+        self._unwritten.clear()
+        self._n_records += len(records)
+        if self._n_records > 2 * self._max_entries:
+            self._compact()
+            return
+
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        with self._path.open("a", encoding="utf-8") as log:
+            log.write(
+                "".join(
+                    json.dumps(record, ensure_ascii=False) + "\n" for record in records
+                )
+            )
+
+    def _compact(self):
+        entries = self._load()
+        write_atomic(
+            self._path,
+            "".join(
+                json.dumps({"key": key, "content": content}, ensure_ascii=False) + "\n"
+                for key, content in entries.items()
+            ),
+        )
+        self._n_records = len(entries)
+
+    def _load(self) -> OrderedDict[str, str]:
+        if self._entries is not None:
+            return self._entries
+
+        entries = OrderedDict()
+        n_records = 0
+        if self._path.exists():
+            with self._path.open("r", encoding="utf-8") as log:
+                for raw_record in filter(str.strip, log):
+                    try:
+                        record = json.loads(raw_record)
+                    except json.JSONDecodeError:
+                        # Only a crash mid-write leaves a truncated record
+                        continue
+                    n_records += 1
+                    key = record["key"]
+                    if record.get("deleted"):
+                        entries.pop(key, None)
+                    elif (content := record.get("content")) is not None:
+                        entries[key] = content
+                    if key in entries:
+                        entries.move_to_end(key)
+        while len(entries) > self._max_entries:
+            entries.popitem(last=False)
+        self._entries = entries
+        self._n_records = n_records
+        return entries
+
+
+def _dump_model(value: Any) -> Any:
+    if isinstance(value, (ollama.Message, ollama.Options)):
+        return value.model_dump(exclude_none=True)
+    return dict(value) if value else value
+
+
+_default_response_cache: Optional[ResponseCache] = None
+
+
+def default_response_cache() -> ResponseCache:
+    global _default_response_cache
+    if _default_response_cache is None:
+        _default_response_cache = ResponseCache()
+    return _default_response_cache
+
+
+def flush_responses():
+    if _default_response_cache is not None:
+        _default_response_cache.flush()
+
+
+atexit.register(flush_responses)
+
+
+def _is_cacheable(kwargs: dict[str, Any]) -> bool:
+    return not (kwargs.get("stream") or kwargs.get("tools"))
+
+
+def _request_key(model: str, messages: Any, kwargs: dict[str, Any]) -> str:
+    return ResponseCache.key(
+        model, messages, kwargs.get("format"), kwargs.get("options")
+    )
+
+
+def _cached_response(model: str, content: str) -> ollama.ChatResponse:
+    return ollama.ChatResponse(
+        model=model,
+        message=ollama.Message(role="assistant", content=content),
+        done=True,
     )
-    translated = response.message.content
+
+
+class CachedClient(ollama.Client):
+    # Serves repeated chat requests from a `ResponseCache`, so a rerun over the
+    # same inputs sends no requests at all. Streaming and tool calls bypass it.
+    # A response the caller rejects has to be forgotten for a retry of the same
+    # request to reach the model.
+    def __init__(
+        self,
+        host: Optional[str] = None,
+        *,
+        cache: Optional[ResponseCache] = None,
+        **kwargs: Any,
+    ):
+        super().__init__(host, **kwargs)
+        self._cache = cache
+
+    @property
+    def cache(self) -> ResponseCache:
+        return default_response_cache() if self._cache is None else self._cache
+
+    def chat(self, model: str = "", messages: Any = None, **kwargs: Any) -> Any:
+        if not _is_cacheable(kwargs):
+            return super().chat(model, messages, **kwargs)
+
+        key = _request_key(model, messages, kwargs)
+        if (content := self.cache.get(key)) is not None:
+            return _cached_response(model, content)
+
+        response = super().chat(model, messages, **kwargs)
+        if response.message.content is not None:
+            self.cache.put(key, response.message.content)
+        return response
+
+    def forget(self, model: str, messages: Any, **kwargs: Any):
+        self.cache.discard(_request_key(model, messages, kwargs))
+
+
+class AsyncCachedClient(ollama.AsyncClient):
+    def __init__(
+        self,
+        host: Optional[str] = None,
+        *,
+        cache: Optional[ResponseCache] = None,
+        **kwargs: Any,
+    ):
+        super().__init__(host, **kwargs)
+        self._cache = cache
+
+    @property
+    def cache(self) -> ResponseCache:
+        return default_response_cache() if self._cache is None else self._cache
+
+    async def chat(self, model: str = "", messages: Any = None, **kwargs: Any) -> Any:
+        if not _is_cacheable(kwargs):
+            return await super().chat(model, messages, **kwargs)
+
+        # The cache reads and writes its log, which is kept off the event loop
+        key = _request_key(model, messages, kwargs)
+        if (content := await asyncio.to_thread(self.cache.get, key)) is not None:
+            return _cached_response(model, content)
+
+        response = await super().chat(model, messages, **kwargs)
+        if response.message.content is not None:
+            await asyncio.to_thread(self.cache.put, key, response.message.content)
+        return response
+
+    def forget(self, model: str, messages: Any, **kwargs: Any):
+        self.cache.discard(_request_key(model, messages, kwargs))
+
+
+_client: Final = CachedClient()
+
+
+class _TranslationCache:
+    # Translations are kept in one append-only log per model, keyed by the hash
+    # of the translated text, so a text is only ever translated once per model
+    def __init__(self, model_name: str):
+        self._model_name = model_name
+        self._lock = threading.Lock()
+        self._translations: Optional[dict[str, str]] = None
+        self._pending: dict[str, str] = {}
+
+    @property
+    def path(self) -> Path:
+        name = _UNSAFE_FILE_NAME_PATTERN.sub("_", self._model_name)
+        return _translations_path / f"translations_{name}.jsonl"
+
+    def get(self, text: str) -> Optional[str]:
+        with self._lock:
+            return self._load().get(_hash_text(text))
+
+    def put(self, text: str, translation: str):
+        with self._lock:
+            hashed_text = _hash_text(text)
+            self._load()[hashed_text] = self._pending[hashed_text] = translation
+
+    def flush(self):
+        with self._lock:
+            if not self._pending:
+                return
+            records = "".join(
+                json.dumps(
+                    {"hash": hashed_text, "translation": translation},
+                    ensure_ascii=False,
+                )
+                + "\n"
+                for hashed_text, translation in self._pending.items()
+            )
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as log:
+                log.write(records)
+            self._pending.clear()
+
+    def _load(self) -> dict[str, str]:
+        if self._translations is not None:
+            return self._translations
+
+        translations = {}
+        if self.path.exists():
+            with self.path.open("r", encoding="utf-8") as log:
+                for raw_record in filter(str.strip, log):
+                    try:
+                        record = json.loads(raw_record)
+                    except json.JSONDecodeError:
+                        # Only a crash mid-write leaves a truncated record
+                        continue
+                    translations[record["hash"]] = record["translation"]
+        self._translations = translations
+        return translations
+
+
+def _hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode(encoding="utf-8")).hexdigest()
+
+
+_translations_path = TRANSLATIONS_PATH
+_translation_caches: dict[str, _TranslationCache] = {}
+_translation_caches_lock = threading.Lock()
+
+
+def _translation_cache(model_name: str) -> _TranslationCache:
+    with _translation_caches_lock:
+        if (cache := _translation_caches.get(model_name)) is None:
+            _translation_caches[model_name] = cache = _TranslationCache(model_name)
+        return cache
+
+
+def flush_translations():
+    with _translation_caches_lock:
+        caches = list(_translation_caches.values())
+    for cache in caches:
+        cache.flush()
+
+
+atexit.register(flush_translations)
+
+
+@contextmanager
+def temporary_caches() -> Generator[Path]:
+    # Swaps the translation and response caches for empty ones in a temporary
+    # directory, so every request reaches the model without touching the real
+    # caches
+    global _default_response_cache, _translations_path
+    flush_translations()
+    saved = (_default_response_cache, _translations_path, dict(_translation_caches))
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory)
+        _default_response_cache = ResponseCache(path / "responses.jsonl")
+        _translations_path = path / "translations"
+        _translation_caches.clear()
+        try:
+            yield path
+        finally:
+            flush_translations()
+            _default_response_cache, _translations_path, caches = saved
+            _translation_caches.clear()
+            _translation_caches.update(caches)
+
+
+def _clean_translation(translated: Optional[str]) -> str:
     assert translated is not None
-    translated = _ANNOTATED_TRANSLATION_PATTERN.sub("", translated).strip()
+    return _ANNOTATED_TRANSLATION_PATTERN.sub("", translated).strip()
+
+
+def translate_llm(
+    text: str,
+    model_name: str = DEFAULT_MODEL,
+    *,
+    client: Optional[ollama.Client] = None,
+) -> str:
+    cache = _translation_cache(model_name)
+    if (translated := cache.get(text)) is not None:
+        return translated
+
+    metrics = model_metrics(model_name)
+    metrics.record_request()
+    start = time.perf_counter()
+    response = (_client if client is None else client).chat(
+        model_name, messages=MessageFactory(_translate_prompt).create_message(text).to_list()
+    )
+    metrics.record_response(time.perf_counter() - start)
+    translated = _clean_translation(response.message.content)
+    cache.put(text, translated)
     return translated
 
+
+class TranslationService:
+    # Translates many texts concurrently over the async client, with at most
+    # `max_concurrency` requests in flight. Up to `batch_size` sentences are
+    # sent in a single prompt, and a batch whose response can't be matched back
+    # to its sentences is translated one sentence at a time instead.
+    def __init__(
+        self,
+        model_name: str = DEFAULT_MODEL,
+        *,
+        host: Optional[str] = None,
+        max_concurrency: int = 4,
+        batch_size: int = 8,
+        timeout: Optional[float] = None,
+    ):
+        self._model_name = model_name
+        self._client = AsyncCachedClient(host, timeout=timeout)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._batch_size = batch_size
+        self._cache = _translation_cache(model_name)
+
+    async def translate(self, text: str) -> str:
+        (translated,) = await self.translate_many([text])
+        return translated
+
+    async def translate_many(self, texts: Iterable[str]) -> list[str]:
+        texts = list(texts)
+        missing_texts = [
+            text for text in dict.fromkeys(texts) if self._cache.get(text) is None
+        ]
+        batches = [
+            missing_texts[i : i + self._batch_size]
+            for i in range(0, len(missing_texts), self._batch_size)
+        ]
+        for batch_translations in await asyncio.gather(
+            *map(self._translate_batch, batches)
+        ):
+            for text, translated in batch_translations.items():
+                self._cache.put(text, translated)
+        self._cache.flush()
+        return [cast(str, self._cache.get(text)) for text in texts]
+
+    async def _translate_batch(self, texts: Sequence[str]) -> dict[str, str]:
+        if len(texts) > 1:
+            content = json.dumps(
+                {"sentences": list(texts)}, ensure_ascii=False, indent=2
+            )
+            response = await self._chat(_translate_batch_prompt, content, "json")
+            try:
+                translations = json.loads(response)["translations"]
+            except (json.JSONDecodeError, KeyError, TypeError):
+                translations = None
+            if (
+                isinstance(translations, list)
+                and len(translations) == len(texts)
+                and all(isinstance(translated, str) for translated in translations)
+            ):
+                return {
+                    text: _clean_translation(translated)
+                    for text, translated in zip(texts, translations, strict=True)
+                }
+
+        single_translations = await asyncio.gather(
+            *(self._chat(_translate_prompt, text) for text in texts)
+        )
+        return {
+            text: _clean_translation(translated)
+            for text, translated in zip(texts, single_translations, strict=True)
+        }
+
+    async def _chat(self, prompt: str, content: str, format: str = "") -> str:
+        async with self._semaphore:
+            response = await self._client.chat(
+                self._model_name,
+                MessageFactory(prompt).create_message(content).to_list(),
+                format=format,
+            )
+        assert response.message.content is not None
+        return response.message.content
+
+
+def translate_many(
+    texts: Iterable[str], model_name: str = DEFAULT_MODEL, **kwargs: Any
+) -> list[str]:
+    # Blocking counterpart of `TranslationService.translate_many`. Inside a
+    # running event loop (e.g. in a notebook), which can't be blocked on, the
+    # translations run in a loop of their own in another thread.
+    async def run() -> list[str]:
+        return await TranslationService(model_name, **kwargs).translate_many(texts)
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(run())
+    with concurrent.futures.ThreadPoolExecutor(1) as executor:
+        return executor.submit(asyncio.run, run()).result()
+
+
 @dataclass
 class ModelMessage:
     prompt: ollama.Message
@@ -49,15 +542,135 @@ class ModelResponse:
     message: ModelMessage
     content: str
     metadata: dict[str, Any]
+    error: Optional[BaseException] = None
+
+    @property
+    def failed(self) -> bool:
+        return self.error is not None
+
+
+@dataclass
+class ModelMetrics:
+    n_requests: int = 0
+    n_responses: int = 0
+    n_retries: int = 0
+    n_timeouts: int = 0
+    n_failures: int = 0
+    total_latency: float = 0.0
+    max_latency: float = 0.0
+    first_request_at: Optional[float] = None
+    last_response_at: Optional[float] = None
+    latencies: list[float] = field(default_factory=list, repr=False)
+
+    def __str__(self) -> str:
+        return (
+            f"{self.n_responses} responses ({self.n_failures} failed, "
+            f"{self.n_retries} retries, {self.n_timeouts} timeouts), "
+            f"{self.mean_latency:.3f}s mean latency, {self.max_latency:.3f}s max, "
+            f"{self.throughput:.2f} responses/s"
+        )
+
+    @property
+    def mean_latency(self) -> float:
+        return self.total_latency / self.n_responses if self.n_responses else 0.0
+
+    @property
+    def throughput(self) -> float:
+        if self.first_request_at is None or self.last_response_at is None:
+            return 0.0
+        elapsed = self.last_response_at - self.first_request_at
+        return self.n_responses / elapsed if elapsed else 0.0
+
+    def latency_percentile(self, percentile: float) -> float:
+        # Nearest rank, so the result is always an observed latency
+        if not self.latencies:
+            return 0.0
+        latencies = sorted(self.latencies)
+        rank = math.ceil(percentile / 100 * len(latencies))
+        return latencies[max(rank, 1) - 1]
+
+    def record_request(self):
+        self.n_requests += 1
+        if self.first_request_at is None:
+            self.first_request_at = time.perf_counter()
+
+    def record_response(self, latency: float):
+        self.n_responses += 1
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+        self.last_response_at = time.perf_counter()
+        self.latencies.append(latency)
+
+
+_metrics_by_model: defaultdict[str, ModelMetrics] = defaultdict(ModelMetrics)
+
+
+def model_metrics(model_name: str = DEFAULT_MODEL) -> ModelMetrics:
+    return _metrics_by_model[model_name]
+
+
+def reset_model_metrics():
+    _metrics_by_model.clear()
+
+
+# Overloaded or restarting servers answer with these, and the request is worth
+# sending again
+_TRANSIENT_STATUS_CODES: Final = frozenset({408, 429, 500, 502, 503, 504})
+
+
+def _is_transient(error: BaseException) -> bool:
+    if isinstance(error, ollama.ResponseError):
+        return error.status_code in _TRANSIENT_STATUS_CODES
+    return isinstance(error, (ConnectionError, TimeoutError))
+
 
 class ModelResponseGenerator:
-    def __init__(self, task_group: asyncio.TaskGroup, model_name: str = _DEFAULT_MODEL, wait_time: float = 1.0):
-        self._task_group = task_group
+    # At most `max_in_flight` requests are sent at once, and at most
+    # `max_queued` messages can be waiting for a response or to be consumed, so
+    # `enqueue` blocks until the consumer catches up. A response stays owned by
+    # the consumer until the next one is requested, so re-enqueueing it to
+    # retry doesn't need a free slot. Transient errors and timeouts are retried
+    # with exponential backoff; once `max_retries` is exhausted the response is
+    # yielded with its `error` set. The stream ends once `None` has been
+    # enqueued and every message has been answered and consumed. `task_group`
+    # is deprecated and ignored, since `run` starts its workers in its own group.
+    def __init__(
+        self,
+        task_group: Optional[asyncio.TaskGroup] = None,
+        model_name: str = DEFAULT_MODEL,
+        wait_time: float = 1.0,
+        *,
+        host: Optional[str] = None,
+        max_in_flight: int = 4,
+        max_queued: int = 64,
+        max_retries: int = 3,
+        backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        timeout: Optional[float] = None,
+        format: Optional[str | dict[str, Any]] = None,
+        options: Optional[dict[str, Any]] = None,
+    ):
         self._model_name = model_name
         self._wait_time = wait_time
-        self._client = ollama.AsyncClient()
+        self._client = AsyncCachedClient(host)
+        self._max_in_flight = max_in_flight
+        self._max_retries = max_retries
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._timeout = timeout
+        self._chat_kwargs = {"format": format, "options": options}
+        self._capacity = asyncio.Semaphore(max_queued)
         self._messages: asyncio.Queue[Optional[ModelMessage]] = asyncio.Queue()
-        self._responses: asyncio.Queue[ModelResponse] = asyncio.Queue()
+        self._responses: asyncio.Queue[Optional[ModelResponse]] = asyncio.Queue()
+        self._n_outstanding = 0
+        self._held: Optional[ModelResponse] = None
+        self._closed = False
+        self._finished = False
+        self._streaming = False
+        self._running = False
+
+    def __aiter__(self) -> AsyncIterator[ModelResponse]:
+        return self._stream()
 
     @property
     def running(self) -> bool:
@@ -67,33 +680,124 @@ class ModelResponseGenerator:
     def running(self, value: bool):
         self._running = value
 
+    @property
+    def metrics(self) -> ModelMetrics:
+        return model_metrics(self._model_name)
+
     async def poll_response(self) -> Optional[ModelResponse]:
-        if self._responses.qsize() > 0:
-            return await self._responses.get()
-        else:
+        self._release_held()
+        if self._responses.qsize() == 0:
             return None
+        return self._take(await self._responses.get())
 
     async def wait(self):
         await asyncio.sleep(self._wait_time)
 
     async def run(self):
-        while True:
-            if (message := await self._messages.get()) is None:
-                return
-            self._task_group.create_task(self._worker(message))
+        self._running = True
+        try:
+            async with asyncio.TaskGroup() as workers:
+                for _ in range(self._max_in_flight):
+                    workers.create_task(self._worker())
+        finally:
+            self._running = False
 
     async def enqueue(self, item: Optional[ModelMessage | ModelResponse]):
         if item is None:
-            await self._messages.put(None)
-        elif isinstance(item, ModelResponse):
-            await self._messages.put(item.message)
+            self._closed = True
+            if not self._streaming:
+                # Polling consumers close once they are done with their last
+                # response, while a stream may still retry the one it holds
+                self._release_held()
+            self._finish_if_done()
+        elif isinstance(item, ModelResponse) and item is self._held:
+            # The slot of the held response is handed over to its retry
+            self.reject(item)
+            self._held = None
+            self._messages.put_nowait(item.message)
         else:
-            await self._messages.put(item)
-
-    async def _worker(self, message: ModelMessage):
-        response = await self._client.chat(self._model_name, message.to_list())
-        content = response.message.content
-        assert content is not None
-        await self._responses.put(
-            ModelResponse(message, content, message.metadata)
+            if isinstance(item, ModelResponse):
+                self.reject(item)
+            await self._capacity.acquire()
+            self._n_outstanding += 1
+            self._messages.put_nowait(
+                item.message if isinstance(item, ModelResponse) else item
+            )
+
+    def reject(self, response: ModelResponse):
+        # Keeps an unusable response out of the response cache, so it isn't
+        # served again to a retry or a later run
+        self._client.forget(
+            self._model_name, response.message.to_list(), **self._chat_kwargs
         )
+
+    async def _stream(self) -> AsyncIterator[ModelResponse]:
+        self._streaming = True
+        try:
+            while True:
+                self._release_held()
+                if (response := self._take(await self._responses.get())) is None:
+                    return
+                yield response
+        finally:
+            self._streaming = False
+
+    def _take(self, response: Optional[ModelResponse]) -> Optional[ModelResponse]:
+        if response is None:
+            # Left in place for any other consumer
+            self._responses.put_nowait(None)
+        self._held = response
+        return response
+
+    def _release_held(self):
+        if self._held is None:
+            return
+        self._held = None
+        self._n_outstanding -= 1
+        self._capacity.release()
+        self._finish_if_done()
+
+    def _finish_if_done(self):
+        if self._finished or not self._closed or self._n_outstanding > 0:
+            return
+        self._finished = True
+        self._responses.put_nowait(None)
+        for _ in range(self._max_in_flight):
+            self._messages.put_nowait(None)
+
+    async def _worker(self):
+        while (message := await self._messages.get()) is not None:
+            self._responses.put_nowait(await self._request(message))
+
+    async def _request(self, message: ModelMessage) -> ModelResponse:
+        metrics = self.metrics
+        error: BaseException
+        for attempt in range(self._max_retries + 1):
+            if attempt > 0:
+                metrics.n_retries += 1
+                await asyncio.sleep(
+                    min(self._backoff * 2 ** (attempt - 1), self._max_backoff)
+                )
+
+            metrics.record_request()
+            start = time.perf_counter()
+            try:
+                async with asyncio.timeout(self._timeout):
+                    response = await self._client.chat(
+                        self._model_name, message.to_list(), **self._chat_kwargs
+                    )
+            except TimeoutError as e:
+                metrics.n_timeouts += 1
+                error = e
+            except Exception as e:
+                if not _is_transient(e):
+                    raise
+                error = e
+            else:
+                metrics.record_response(time.perf_counter() - start)
+                content = response.message.content
+                assert content is not None
+                return ModelResponse(message, content, message.metadata)
+
+        metrics.n_failures += 1
+        return ModelResponse(message, "", message.metadata, error)
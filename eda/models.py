@@ -1,16 +1,42 @@
-import concurrent.futures
 import enum
+import os
 import re
-from collections.abc import Iterator
+import time
+from collections.abc import Callable, Iterable, Iterator, Sequence
 from dataclasses import dataclass, field
 from functools import cached_property
-from typing import ClassVar, Optional, Protocol, Self, cast, overload, runtime_checkable
-
+from typing import (
+    ClassVar,
+    Final,
+    Optional,
+    Protocol,
+    Self,
+    cast,
+    overload,
+    runtime_checkable,
+)
+
+import numpy as np
 import pandas as pd
 from tqdm import tqdm
 
-from eda.language import AttributedWord, TaggedText, tag
-from eda.sentiments import TextSentiments
+from eda.language import (
+    DEFAULT_PIPELINE_PROFILE,
+    AttributedWord,
+    PipelineProfile,
+    TaggedText,
+    has_cached_tags,
+    tag,
+    tag_many,
+)
+from eda.sentiments import (
+    ScoringBackend,
+    TextSentiments,
+    flush_polarity_scores,
+    has_cached_polarity_scores,
+    polarity_scores_many,
+)
+from eda.tokens import empty_token_table
 from eda.utils import filter_series, random_hex_colour, truthy_tuple
 
 # Based on the oldest (recorded) person to ever live, Jeanne Calment
@@ -22,19 +48,37 @@ _OVER_AGE = -1
 _OVER_EIGHTY_FIVE = "over 85"
 
 
+_PAUSES_PATTERN = re.compile(r"\(\.\) ")
+_UNKNOWNS_PATTERN = re.compile(r"[xX]{2,} |(?<= )[xX] ")
+_BRACKETED_PATTERN = re.compile(r"\{.+?\}")
+_PS_PATTERN = re.compile(r"\{[pP]\} ")
+_SYMBOLS_PATTERN = re.compile(r"[\[\]<>°.?:()]|\.(?<=[A-Za-z])")
+
+
 def _simplify_text(text: str, lowercased: bool = True) -> str:
     # Even the normalised text may still contain things we don't want
     # We can remove that in this function
     if lowercased:
         text = text.lower()
-    without_pauses = re.sub(r"\(\.\) ", "", text)
-    without_unknowns = re.sub(r"[xX]{2,} |(?<= )[xX] ", "", without_pauses)
-    without_bracketed = re.sub(r"\{.+?\}", "", without_unknowns)
-    without_ps = re.sub(r"\{[pP]\} ", "", without_bracketed)
-    simplifed = re.sub(r"[\[\]<>°.?:()]|\.(?<=[A-Za-z])", "", without_ps)
+    without_pauses = _PAUSES_PATTERN.sub("", text)
+    without_unknowns = _UNKNOWNS_PATTERN.sub("", without_pauses)
+    without_bracketed = _BRACKETED_PATTERN.sub("", without_unknowns)
+    without_ps = _PS_PATTERN.sub("", without_bracketed)
+    simplifed = _SYMBOLS_PATTERN.sub("", without_ps)
     return simplifed
 
 
+def _simplify_texts(texts: Sequence[str], lowercased: bool = True) -> list[str]:
+    # The texts are joined by newlines so that every pattern runs once over the
+    # whole batch. None of the patterns can match across a newline, which only
+    # holds as long as the texts don't contain newlines themselves.
+    if not texts:
+        return []
+    if any("\n" in text for text in texts):
+        return [_simplify_text(text, lowercased) for text in texts]
+    return _simplify_text("\n".join(texts), lowercased).split("\n")
+
+
 class MacroRegion(enum.Enum):
     NORTH = enum.auto()
     CENTRE = enum.auto()
@@ -183,6 +227,18 @@ _FALLING_INTONATION_PATTERN = re.compile(r"(.+?)\.")
 _WEAKLY_RISING_INTOATION_PATTERN = re.compile(r"(.+?)\,")
 _RISING_INTONATION_PATTERN = re.compile(r"(.+?)\?")
 
+_PROSODIC_PATTERNS: Final = {
+    "overlapping_phrases": _OVERLAPPING_PATTERN,
+    "sped_up_phrases": _SPED_UP_PATTERN,
+    "slowed_down_phrases": _SLOW_DOWN_PATTERN,
+    "low_volume_phrases": _LOW_VOLUME_PATTERN,
+    "raised_volume_phrases": _RAISED_VOLUME_PATTERN,
+    "falling_intonation_phrases": _FALLING_INTONATION_PATTERN,
+    "rising_intonation_phrases": _RISING_INTONATION_PATTERN,
+    "weakly_rising_intonation_phrases": _WEAKLY_RISING_INTOATION_PATTERN,
+}
+PROSODIC_FEATURES: Final = tuple(_PROSODIC_PATTERNS)
+
 
 @dataclass
 class ConversationLine:
@@ -191,18 +247,28 @@ class ConversationLine:
     participant: Participant
     text: str
     normalised_words: list[AttributedWord]
-    normalised_text: str = field(init=False)
-    sentiments: TextSentiments = field(init=False)
 
-    def __post_init__(self):
-        self.normalised_text = " ".join(self.normalised_words)
-        self.sentiments = TextSentiments(
-            _simplify_text(self.normalised_text), self.conversation_code
-        )
+    @cached_property
+    def normalised_text(self) -> str:
+        return " ".join(self.normalised_words)
+
+    @cached_property
+    def sentiments(self) -> TextSentiments:
+        return TextSentiments(_simplify_text(self.normalised_text))
+
+    def has_loaded_sentiments(self) -> bool:
+        return "sentiments" in vars(self)
 
     @cached_property
     def tagged(self) -> list[TaggedText]:
-        return tag(_simplify_text(self.normalised_text, lowercased=False))
+        return tag(self.tagging_text)
+
+    @property
+    def tagging_text(self) -> str:
+        return _simplify_text(self.normalised_text, lowercased=False)
+
+    def has_loaded_tagged(self) -> bool:
+        return "tagged" in vars(self)
 
     @staticmethod
     def _property_factory(pattern: re.Pattern[str]) -> cached_property[tuple[str, ...]]:
@@ -223,14 +289,283 @@ class ConversationLine:
     weakly_rising_intonation_phrases = _property_factory(_WEAKLY_RISING_INTOATION_PATTERN)
 
     def load_prosodic(self):
-        _ = self.overlapping_phrases
-        _ = self.sped_up_phrases
-        _ = self.slowed_down_phrases
-        _ = self.low_volume_phrases
-        _ = self.raised_volume_phrases
-        _ = self.rising_intonation_phrases
-        _ = self.weakly_rising_intonation_phrases
-        _ = self.falling_intonation_phrases
+        for name in PROSODIC_FEATURES:
+            getattr(self, name)
+
+    def has_loaded_prosodic(self) -> bool:
+        return all(name in vars(self) for name in PROSODIC_FEATURES)
+
+
+def normalise_lines(lines: Iterable[ConversationLine]):
+    # Fills the normalised text and sentiments of a batch of lines at once,
+    # instead of line by line on first access
+    lines = [line for line in lines if not line.has_loaded_sentiments()]
+    normalised_texts = [line.normalised_text for line in lines]
+    for line, text in zip(lines, _simplify_texts(normalised_texts), strict=True):
+        # Assigning fills the slot used by the cached property
+        line.sentiments = TextSentiments(text)
+
+
+# One row per line, in the order of the conversation, with the number of
+# phrases of each prosodic feature
+PROSODIC_TABLE_DTYPES: Final = {
+    "conversation_code": "category",
+    "tu_id": np.int32,
+    "participant_code": "category",
+} | dict.fromkeys(PROSODIC_FEATURES, np.int32)
+
+
+def extract_prosodic_phrases(texts: Iterable[str]) -> pd.DataFrame:
+    # Each text is scanned once for every feature, and each distinct match is
+    # simplified once. Phrases that simplify to nothing are dropped, like in the
+    # `ConversationLine` properties.
+    line_indices: list[int] = []
+    feature_codes: list[int] = []
+    matches: list[str] = []
+    patterns = list(enumerate(_PROSODIC_PATTERNS.values()))
+    for line_index, text in enumerate(texts):
+        for feature_code, pattern in patterns:
+            if found := pattern.findall(text):
+                line_indices.extend([line_index] * len(found))
+                feature_codes.extend([feature_code] * len(found))
+                matches.extend(found)
+
+    distinct_matches = list(dict.fromkeys(matches))
+    simplified = dict(
+        zip(distinct_matches, _simplify_texts(distinct_matches), strict=True)
+    )
+    phrases = pd.DataFrame({
+        "line": np.asarray(line_indices, dtype=np.int32),
+        "feature": pd.Categorical.from_codes(
+            np.asarray(feature_codes, dtype=np.int8), categories=PROSODIC_FEATURES
+        ),
+        "phrase": np.asarray([simplified[match] for match in matches], dtype=object),
+    })
+    return phrases[phrases["phrase"] != ""].reset_index(drop=True)
+
+
+def load_prosodic_lines(lines: Iterable[ConversationLine]) -> np.ndarray:
+    # Fills the prosodic properties of the lines that don't have them yet, and
+    # returns the number of phrases of every line (rows) and feature (columns)
+    lines = list(lines)
+    unloaded_lines = [line for line in lines if not line.has_loaded_prosodic()]
+    phrases = extract_prosodic_phrases(line.text for line in unloaded_lines)
+
+    line_phrases: dict[tuple[int, int], list[str]] = {}
+    for line_index, feature_code, phrase in zip(
+        phrases["line"].tolist(),
+        phrases["feature"].cat.codes.tolist(),
+        phrases["phrase"].tolist(),
+        strict=True,
+    ):
+        line_phrases.setdefault((line_index, feature_code), []).append(phrase)
+
+    for line_index, line in enumerate(unloaded_lines):
+        for feature_code, name in enumerate(PROSODIC_FEATURES):
+            # Assigning fills the slot used by the cached property
+            setattr(line, name, tuple(line_phrases.get((line_index, feature_code), ())))
+
+    return np.array(
+        [[len(getattr(line, name)) for name in PROSODIC_FEATURES] for line in lines],
+        dtype=np.int32,
+    ).reshape(-1, len(PROSODIC_FEATURES))
+
+
+def build_prosodic_table(
+    conversation_code: str,
+    *,
+    tu_ids: Sequence[int] | np.ndarray,
+    participant_codes: Sequence[str] | np.ndarray,
+    counts: np.ndarray,
+) -> pd.DataFrame:
+    table = pd.DataFrame({
+        "conversation_code": pd.Categorical([conversation_code] * len(tu_ids)),
+        "tu_id": np.asarray(tu_ids, dtype=np.int32),
+        "participant_code": pd.Categorical(participant_codes),
+    })
+    for feature_code, name in enumerate(PROSODIC_FEATURES):
+        table[name] = np.asarray(counts[:, feature_code], dtype=np.int32)
+    return table
+
+
+def empty_prosodic_table() -> pd.DataFrame:
+    return pd.DataFrame({
+        name: pd.Series(dtype=dtype) for name, dtype in PROSODIC_TABLE_DTYPES.items()
+    })
+
+
+@dataclass(frozen=True)
+class DeduplicationStats:
+    n_texts: int
+    n_unique_texts: int
+    n_cached_texts: int
+
+    def __str__(self) -> str:
+        return (
+            f"{self.n_texts} texts, {self.n_unique_texts} unique, "
+            f"{self.n_cached_texts} cached, {self.n_processed_texts} processed "
+            f"({self.saved_percentage:.1f}% saved)"
+        )
+
+    @property
+    def n_processed_texts(self) -> int:
+        return self.n_unique_texts - self.n_cached_texts
+
+    @property
+    def saved_percentage(self) -> float:
+        if not self.n_texts:
+            return 0.0
+        return (1 - self.n_processed_texts / self.n_texts) * 100
+
+    @classmethod
+    def collect(cls, texts: Sequence[str], is_cached: Callable[[str], bool]) -> Self:
+        unique_texts = dict.fromkeys(texts)
+        return cls(len(texts), len(unique_texts), sum(map(is_cached, unique_texts)))
+
+    @classmethod
+    def combine(cls, stats: Iterable[Self]) -> Self:
+        # Texts are only unique within each of `stats`, so a text shared by two
+        # of them is counted twice
+        stats = list(stats)
+        return cls(
+            sum(stat.n_texts for stat in stats),
+            sum(stat.n_unique_texts for stat in stats),
+            sum(stat.n_cached_texts for stat in stats),
+        )
+
+
+@dataclass(frozen=True)
+class _LinesReport:
+    _verb: ClassVar[str]
+
+    n_lines: int
+    elapsed: float
+    texts: DeduplicationStats
+
+    def __str__(self) -> str:
+        return (
+            f"{self._verb} {self.n_lines} lines in {self.elapsed:.2f}s "
+            f"({self.lines_per_second:.1f} lines/s); {self.texts}"
+        )
+
+    @property
+    def lines_per_second(self) -> float:
+        return self.n_lines / self.elapsed if self.elapsed else 0.0
+
+    @classmethod
+    def combine(cls, reports: Iterable[Self], elapsed: float) -> Optional[Self]:
+        # Reports of work done at the same time (e.g. in worker processes) are
+        # summed, except for their time, which overlaps
+        reports = list(reports)
+        if not reports:
+            return None
+        return cls(
+            sum(report.n_lines for report in reports),
+            elapsed,
+            DeduplicationStats.combine(report.texts for report in reports),
+        )
+
+
+@dataclass(frozen=True)
+class TaggingReport(_LinesReport):
+    _verb = "Tagged"
+
+
+@dataclass(frozen=True)
+class ScoringReport(_LinesReport):
+    _verb = "Scored"
+
+
+def tag_lines(
+    lines: Iterable[ConversationLine],
+    *,
+    profile: PipelineProfile = DEFAULT_PIPELINE_PROFILE,
+    batch_size: int = 256,
+    n_process: int = 1,
+    progress_bar: bool = False,
+    desc: str = "tags",
+) -> TaggingReport:
+    untagged_lines = [line for line in lines if not line.has_loaded_tagged()]
+    if progress_bar:
+        pbar = tqdm(
+            total=len(untagged_lines),
+            desc=desc,
+            unit="lines",
+            dynamic_ncols=True,
+            colour=random_hex_colour(min_luma=0.3),
+        )
+    else:
+        pbar = None
+
+    start = time.perf_counter()
+    texts = _simplify_texts(
+        [line.normalised_text for line in untagged_lines], lowercased=False
+    )
+    stats = DeduplicationStats.collect(
+        texts, lambda text: has_cached_tags(text, profile=profile)
+    )
+    tagged_texts = tag_many(
+        texts, profile=profile, batch_size=batch_size, n_process=n_process
+    )
+    for line, tagged in zip(untagged_lines, tagged_texts, strict=True):
+        # Assigning fills the slot used by the `tagged` cached property
+        line.tagged = tagged
+        if pbar is not None:
+            pbar.update(1)
+
+    # The tag cache isn't written here, since every write rewrites the whole
+    # cache: batch callers flush it once they are done, and it is flushed at exit
+    report = TaggingReport(len(untagged_lines), time.perf_counter() - start, stats)
+    if pbar is not None:
+        pbar.set_postfix_str(f"{report.lines_per_second:.1f} lines/s")
+        pbar.close()
+    return report
+
+
+def score_lines(
+    lines: Iterable[ConversationLine],
+    *,
+    backend: ScoringBackend = ScoringBackend.SERIAL,
+    max_workers: Optional[int] = None,
+    chunk_size: int = 256,
+    progress_bar: bool = False,
+    desc: str = "sentiment scores",
+) -> ScoringReport:
+    # Each distinct text is scored once, however many lines (and conversations)
+    # it appears in, and its scores are then shared by all of those lines
+    lines = list(lines)
+    normalise_lines(lines)
+    unscored_lines = [line for line in lines if not line.sentiments.has_loaded_scores()]
+    texts = [line.sentiments.text for line in unscored_lines]
+    stats = DeduplicationStats.collect(texts, has_cached_polarity_scores)
+    if progress_bar:
+        pbar = tqdm(
+            total=stats.n_unique_texts,
+            desc=desc,
+            unit="texts",
+            dynamic_ncols=True,
+            colour=random_hex_colour(),
+        )
+    else:
+        pbar = None
+
+    start = time.perf_counter()
+    scores_by_text = {}
+    for text, scores in polarity_scores_many(
+        texts, backend=backend, max_workers=max_workers, chunk_size=chunk_size
+    ):
+        scores_by_text[text] = scores
+        if pbar is not None:
+            pbar.update(1)
+    for line, text in zip(unscored_lines, texts, strict=True):
+        line.sentiments.restore_scores(scores_by_text[text])
+
+    report = ScoringReport(len(unscored_lines), time.perf_counter() - start, stats)
+    flush_polarity_scores()
+    if pbar is not None:
+        pbar.set_postfix_str(f"{report.lines_per_second:.1f} lines/s")
+        pbar.close()
+    return report
 
 
 @runtime_checkable
@@ -283,6 +618,9 @@ class Conversation(SupportsLineOperations):
     macro_region: MacroRegion
     region: str
     lines: pd.Series
+    # The words of `lines` again, as a side table (see eda.tokens)
+    tokens: pd.DataFrame = field(default_factory=empty_token_table, repr=False)
+    prosody: pd.DataFrame = field(default_factory=empty_prosodic_table, repr=False)
 
     def __post_init__(self):
         self.participants.sort(key=lambda participant: participant.code)
@@ -310,81 +648,50 @@ class Conversation(SupportsLineOperations):
     def has_dialect_spoken(self) -> bool:
         return "dialetto" in self.languages
 
-    def load_sentiment_scores(self, parallel: bool = False, progress_bar: bool = False):
-        if all(line.sentiments.has_loaded_scores() for line in self):
-            return
-
-        if progress_bar:
-            pbar = tqdm(
-                total=len(self),
-                desc=f"{self.code} sentiment scores",
-                unit="lines",
-                dynamic_ncols=True,
-                colour=random_hex_colour(),
-            )
-        else:
-            pbar = None
-
-        def func(line: ConversationLine):
-            line.sentiments.load_scores()
-            if pbar is not None:
-                pbar.update(1)
-
-        if not parallel:
-            for line in self:
-                func(line)
-            if pbar is not None:
-                pbar.close()
-            return
-
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            futures = [executor.submit(lambda: func(line)) for line in self]
-            for future in concurrent.futures.as_completed(futures):
-                future.result()
-
-        if pbar is not None:
-            pbar.close()
-
-    def load_tagged(self, parallel: bool = False, progress_bar: bool = False):
-        if progress_bar:
-            pbar = tqdm(
-                total=len(self),
-                desc=f"{self.code} tags",
-                unit="lines",
-                dynamic_ncols=True,
-                colour=random_hex_colour(min_luma=0.3),
-            )
-        else:
-            pbar = None
-
-        def func(line: ConversationLine):
-            _ = line.tagged
-            if pbar is not None:
-                pbar.update(1)
-
-        if not parallel:
-            for line in self:
-                func(line)
-            return
+    def load_sentiment_scores(
+        self,
+        parallel: bool = False,
+        progress_bar: bool = False,
+        backend: Optional[ScoringBackend] = None,
+    ) -> ScoringReport:
+        if backend is None:
+            backend = ScoringBackend.THREADS if parallel else ScoringBackend.SERIAL
+        return score_lines(
+            self,
+            backend=backend,
+            progress_bar=progress_bar,
+            desc=f"{self.code} sentiment scores",
+        )
 
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            futures = [executor.submit(lambda: func(line)) for line in self]
-            for future in concurrent.futures.as_completed(futures):
-                future.result()
+    def load_tagged(
+        self,
+        parallel: bool = False,
+        progress_bar: bool = False,
+        profile: PipelineProfile = DEFAULT_PIPELINE_PROFILE,
+        batch_size: int = 256,
+        n_process: Optional[int] = None,
+    ) -> TaggingReport:
+        if n_process is None:
+            n_process = (os.cpu_count() or 1) if parallel else 1
+        return tag_lines(
+            self,
+            profile=profile,
+            batch_size=batch_size,
+            n_process=n_process,
+            progress_bar=progress_bar,
+            desc=f"{self.code} tags",
+        )
 
-        if pbar is not None:
-            pbar.close()
-
-    def load_prosodic(self, parallel: bool = False):
-        if not parallel:
-            for line in self:
-                line.load_prosodic()
-            return
-
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            futures = [executor.submit(line.load_prosodic) for line in self]
-            for future in concurrent.futures.as_completed(futures):
-                future.result()
+    def load_prosodic(self):
+        # All the lines are scanned in one pass, which beats scanning them one
+        # by one in threads
+        counts = load_prosodic_lines(self)
+        self.prosody = build_prosodic_table(
+            self.code,
+            tu_ids=[line.tu_id for line in self],
+            participant_codes=[line.participant.code for line in self],
+            counts=counts,
+        )
 
     def participant_lines(
         self,
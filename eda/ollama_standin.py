@@ -0,0 +1,200 @@
+import json
+import random
+import re
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Final, Optional, Self
+
+# Markers of the prompts in `prompts/`, used to tell which canned response a
+# request expects
+_THEMES_MARKER: Final = '"applicable_themes"'
+_BATCH_TRANSLATION_MARKER: Final = '"translations"'
+_THEMES_LIST_PATTERN = re.compile(r"^Themes:\s*\n\s*\n(.+)$", re.MULTILINE)
+
+_FALLBACK_THEMES: Final = ("Work", "Family", "Food", "Travel")
+
+
+class OllamaStandIn:
+    # A local server speaking enough of the Ollama HTTP API (`/api/chat`,
+    # `/api/tags`, `/api/version`) for `eda.llm` to run against it without a
+    # model. Every chat request waits `latency` ± `jitter` seconds, then fails
+    # with a 503 with probability `error_rate`, or otherwise gets a canned
+    # response: the themes of the theme prompt (near-miss JSON with probability
+    # `invalid_json_rate`, though only truncated when a `format` constrains
+    # it), the translations of the batch translation prompt, or a translation of
+    # the user message.
+    def __init__(
+        self,
+        *,
+        latency: float = 0.05,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        invalid_json_rate: float = 0.0,
+        seed: Optional[int] = 0,
+        address: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.invalid_json_rate = invalid_json_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((address, port), _handler(self))
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+        self.n_requests = 0
+        self.n_errors = 0
+        self.n_invalid = 0
+
+    def __enter__(self) -> Self:
+        self.start()
+        return self
+
+    def __exit__(self, *_: Any):
+        self.stop()
+
+    @property
+    def host(self) -> str:
+        address, port = self._server.server_address[:2]
+        return f"http://{address}:{port}"
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._server.serve_forever, daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+    def chat(self, request: dict[str, Any]) -> tuple[HTTPStatus, dict[str, Any]]:
+        with self._lock:
+            self.n_requests += 1
+            delay = self.latency + self._random.uniform(-self.jitter, self.jitter)
+            fails = self._random.random() < self.error_rate
+            invalid = self._random.random() < self.invalid_json_rate
+            self.n_errors += fails
+
+        time.sleep(max(delay, 0.0))
+        if fails:
+            return HTTPStatus.SERVICE_UNAVAILABLE, {"error": "server overloaded"}
+
+        messages = request.get("messages") or [{}]
+        system_prompt = next(
+            (
+                message.get("content", "")
+                for message in messages
+                if message.get("role") == "system"
+            ),
+            "",
+        )
+        user_content = messages[-1].get("content", "")
+        if _THEMES_MARKER in system_prompt:
+            content = self._themes_response(
+                system_prompt, invalid, constrained=bool(request.get("format"))
+            )
+        elif _BATCH_TRANSLATION_MARKER in system_prompt:
+            content = self._batch_translation_response(user_content)
+        else:
+            content = _translate(user_content)
+
+        return HTTPStatus.OK, {
+            "model": request.get("model", ""),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "message": {"role": "assistant", "content": content},
+            "done": True,
+            "done_reason": "stop",
+        }
+
+    def _themes_response(
+        self, system_prompt: str, invalid: bool, constrained: bool
+    ) -> str:
+        if match := _THEMES_LIST_PATTERN.search(system_prompt):
+            themes = sorted(map(str.strip, match.group(1).split(",")))
+        else:
+            themes = list(_FALLBACK_THEMES)
+
+        with self._lock:
+            n_themes = self._random.randint(0, min(3, len(themes)))
+            applicable_themes = self._random.sample(themes, n_themes)
+            content = json.dumps({"applicable_themes": applicable_themes})
+            if not invalid:
+                return content
+
+            # The kind of near misses local models produce
+            self.n_invalid += 1
+            if constrained:
+                return content[: self._random.randrange(1, len(content))]
+            return self._random.choice((
+                f"Sure! Here are the themes:\n{content}",
+                f"```json\n{content}\n```",
+                content.rstrip("}"),
+                content.replace('"', "'"),
+                json.dumps({"themes": applicable_themes}),
+            ))
+
+    def _batch_translation_response(self, user_content: str) -> str:
+        try:
+            sentences = json.loads(user_content)["sentences"]
+        except (json.JSONDecodeError, KeyError, TypeError):
+            sentences = []
+        return json.dumps({"translations": list(map(_translate, sentences))})
+
+
+def _translate(text: str) -> str:
+    return f"EN: {text}"
+
+
+def _handler(standin: OllamaStandIn) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format: str, *args: Any):
+            pass
+
+        def do_GET(self):
+            if self.path == "/api/version":
+                self._send(HTTPStatus.OK, {"version": "0.0.0"})
+            elif self.path == "/api/tags":
+                self._send(HTTPStatus.OK, {"models": []})
+            else:
+                self._send(HTTPStatus.NOT_FOUND, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/api/chat":
+                self._send(HTTPStatus.NOT_FOUND, {"error": "not found"})
+                return
+
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                request = json.loads(self.rfile.read(length))
+            except json.JSONDecodeError:
+                self._send(HTTPStatus.BAD_REQUEST, {"error": "invalid JSON"})
+                return
+
+            status, body = standin.chat(request)
+            if request.get("stream") and status == HTTPStatus.OK:
+                self._send(status, body, "application/x-ndjson")
+            else:
+                self._send(status, body)
+
+        def _send(
+            self,
+            status: HTTPStatus,
+            body: dict[str, Any],
+            content_type: str = "application/json",
+        ):
+            data = json.dumps(body).encode("utf-8") + b"\n"
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return Handler
@@ -1,14 +1,27 @@
 import concurrent.futures
+import itertools
+import os
 import re
-from collections.abc import Iterator
+import time
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass
 from functools import cache
 from pathlib import Path
-from typing import ClassVar, Optional, cast
+from typing import Any, ClassVar, Optional, cast
 
+import numpy as np
 import pandas as pd
-
-from eda.language import AttributedWord
+from tqdm import tqdm
+
+from eda.language import (
+    AttributedWord,
+    flush_tag_cache,
+    jefferson_features_vocabulary,
+    make_tag_caches_read_only,
+    store_tags,
+)
 from eda.models import (
+    PROSODIC_FEATURES,
     AgeRange,
     Conversation,
     ConversationLine,
@@ -16,47 +29,59 @@ from eda.models import (
     MacroRegion,
     Participant,
     ParticipantLines,
+    ScoringReport,
+    TaggingReport,
+    empty_prosodic_table,
+    score_lines,
+    tag_lines,
+)
+from eda.sentiments import ScoringBackend, load_polarity_scores
+from eda.snapshot import (
+    SNAPSHOT_PATH,
+    load_snapshot,
+    save_snapshot,
+    sources_fingerprint,
+)
+from eda.tokens import (
+    TokenTableBuilder,
+    build_token_table,
+    concat_token_tables,
+    jefferson_mask_array,
+    remap_jefferson_masks,
+)
+from eda.utils import (
+    KIPASTI_DATA_PATH,
+    METADATA_PATH,
+    random_hex_colour,
+    read_excel_cached,
 )
-from eda.utils import KIPASTI_DATA_PATH, METADATA_PATH
 
 _DEFAULT_KP_REGION = MacroRegion.CENTRE
 _NON_SPEAKERS = frozenset(("???", "suoni"))
+# What the .vert.tsv files write for a word without Jefferson features, which
+# missing values are read as too
+_NO_JEFFERSON_FEATURES = "_"
 _CONVERSATION_FILE_PATTERN = re.compile(r"(KP[NCS]\d+).csv")
+_CONVERSATION_VERT_FILE_PATTERN = re.compile(r"(KP[NCS]\d+).vert.tsv")
+_PARTICIPANT_COLUMNS: dict[str, Callable[[Participant], str]] = {
+    "generation": lambda participant: participant.generation.name,
+    "macro_region": lambda participant: participant.macro_region.name.lower(),
+    "geographic_origin": lambda participant: participant.geographic_origin,
+}
 
 
 def _kp_code(number: int, region: MacroRegion) -> str:
     return f"KP{region.short_name}{str(number).zfill(3)}"
 
 
-def _kp_vert_path(
-    number_or_code: str | int, region: MacroRegion = _DEFAULT_KP_REGION
-) -> Path:
-    if isinstance(number_or_code, str):
-        return KIPASTI_DATA_PATH / f"{number_or_code}.vert.tsv"
-    padded_number = str(number_or_code).zfill(3)
-    path = KIPASTI_DATA_PATH / f"KP{region.short_name}{padded_number}.vert.tsv"
-    assert path.exists(), f"Path {path} does not exist"
-    return path
-
-
-def _kp_path(
-    number_or_code: str | int, region: MacroRegion = _DEFAULT_KP_REGION
-) -> Path:
-    if isinstance(number_or_code, str):
-        return KIPASTI_DATA_PATH / f"{number_or_code}.csv"
-    padded_number = str(number_or_code).zfill(3)
-    path = KIPASTI_DATA_PATH / f"KP{region.short_name}{padded_number}.csv"
-    assert path.exists(), f"Path {path} does not exist"
-    return path
-
-
 class Participants:
     PARTICIPANTS_FILENAME: ClassVar[str] = "KIPasti_participants.xlsx"
 
-    def __init__(self):
-        self._df = self._parse_dataframe()
-        self._conversations_df = pd.read_excel(
-            METADATA_PATH / "KIPasti_conversations.xlsx"
+    def __init__(self, metadata_path: Path = METADATA_PATH):
+        self._metadata_path = metadata_path
+        self._df = self._parse_dataframe(metadata_path)
+        self._conversations_df = read_excel_cached(
+            metadata_path / "KIPasti_conversations.xlsx"
         )
         region_to_macro_region = self._conversations_df[["region", "macro_region"]]
         region_to_macro_region = region_to_macro_region.drop_duplicates()
@@ -81,6 +106,10 @@ class Participants:
     def __iter__(self) -> Iterator[Participant]:
         return iter(self._participants_by_code.values())
 
+    @property
+    def metadata_path(self) -> Path:
+        return self._metadata_path
+
     @property
     def df(self) -> pd.DataFrame:
         return self._df
@@ -90,12 +119,12 @@ class Participants:
         return self._conversations_df
 
     @classmethod
-    def _parse_dataframe(cls) -> pd.DataFrame:
-        participants_file_path = METADATA_PATH / cls.PARTICIPANTS_FILENAME
+    def _parse_dataframe(cls, metadata_path: Path) -> pd.DataFrame:
+        participants_file_path = metadata_path / cls.PARTICIPANTS_FILENAME
         assert participants_file_path.exists(), (
             f"Path {participants_file_path} does not exist"
         )
-        participants_df = pd.read_excel(
+        participants_df = read_excel_cached(
             participants_file_path,
             keep_default_na=False,
             dtype={
@@ -159,14 +188,31 @@ class Participants:
 
 
 class ConversationParser:
-    def __init__(self, participants: Participants):
+    def __init__(self, participants: Participants, data_path: Path = KIPASTI_DATA_PATH):
         self._participants = participants
+        self._data_path = data_path
         self._conversations_df = participants.conversations_df
+        self._participants_by_code = {
+            participant.code: participant for participant in participants
+        }
+        self._metadata_by_code: dict[str, dict[str, Any]] = {
+            cast(str, record["code"]): record
+            for record in self._conversations_df.to_dict("records")
+        }
+        self._paths_by_code: Optional[dict[str, tuple[Path, Path]]] = None
+
+    @property
+    def data_path(self) -> Path:
+        return self._data_path
+
+    def conversation_codes(self) -> list[str]:
+        return list(self._conversation_paths())
 
     def parse_conversation(
         self,
         number_or_code: str | int,
         default_macro_region: Optional[MacroRegion] = None,
+        vectorized: bool = True,
     ) -> Conversation:
         if isinstance(number_or_code, int):
             conversation_code = _kp_code(
@@ -180,14 +226,112 @@ class ConversationParser:
         macro_region = MacroRegion.from_italian(metadata["macro_region"])
         region = metadata["region"].strip()
 
-        kp_path = _kp_path(number_or_code, macro_region)
-        kp_vert_path = _kp_vert_path(number_or_code, macro_region)
+        try:
+            kp_path, kp_vert_path = self._conversation_paths()[conversation_code]
+        except KeyError:
+            raise ValueError(
+                f"No transcript files for conversation {conversation_code!r}"
+            ) from None
         kp_df = pd.read_csv(kp_path, sep="\t")
         kp_vert_df = pd.read_csv(kp_vert_path, sep="\t")
 
+        build_lines = self._build_lines if vectorized else self._build_lines_iteratively
+        lines, participants, tokens = build_lines(conversation_code, kp_df, kp_vert_df)
+        return Conversation(
+            conversation_code,
+            participants,
+            frozenset(languages),
+            macro_region,
+            region,
+            lines,
+            tokens,
+        )
+
+    def _build_lines(
+        self, conversation_code: str, kp_df: pd.DataFrame, kp_vert_df: pd.DataFrame
+    ) -> tuple[pd.Series, list[Participant], pd.DataFrame]:
+        # Variations on existing lines (speaker "_") can safely be ignored
+        vert_df = kp_vert_df[kp_vert_df["speaker"] != "_"]
+        speakers = vert_df["speaker"].to_numpy()
+        tu_ids = vert_df["tu_id"].to_numpy()
+
+        # A line starts wherever the tu_id changes, and starts with the next row
+        # of the .csv file. Its words are those read since the previous line
+        # started, exactly like the row by row loop in
+        # `_build_lines_iteratively`.
+        previous_tu_ids = np.concatenate(([0], tu_ids[:-1]))
+        starts_line = tu_ids != previous_tu_ids
+        line_positions = np.flatnonzero(starts_line)
+        segments = np.cumsum(starts_line)
+
+        is_word = vert_df["form"].map(lambda form: isinstance(form, str)).to_numpy()
+        word_df = vert_df[is_word]
+        word_segments = segments[is_word]
+        raw_features = (
+            word_df["jefferson_feats"].fillna(_NO_JEFFERSON_FEATURES).astype(str)
+        )
+        mask_by_raw_features = {
+            raw: jefferson_features_vocabulary.encode(raw.split("|"))
+            for raw in raw_features.unique()
+        }
+        jefferson_masks = raw_features.map(mask_by_raw_features).tolist()
+        words = [
+            AttributedWord(
+                form, word_type=word_type, jefferson_features=mask, variation=variation
+            )
+            for form, word_type, mask, variation in zip(
+                word_df["form"].tolist(),
+                word_df["type"].tolist(),
+                jefferson_masks,
+                word_df["variation"].tolist(),
+                strict=True,
+            )
+        ]
+        word_bounds = np.searchsorted(
+            word_segments, np.arange(len(line_positions) + 1)
+        ).tolist()
+
+        texts = kp_df["text"].tolist()
+        line_tu_ids = tu_ids[line_positions].tolist()
+        line_speakers = speakers[line_positions].tolist()
+        participants_by_code: dict[str, Participant] = {}
+        result = []
+        for i, (tu_id, speaker) in enumerate(zip(line_tu_ids, line_speakers)):
+            if speaker in _NON_SPEAKERS:
+                continue
+            if (participant := participants_by_code.get(speaker)) is None:
+                participants_by_code[speaker] = participant = (
+                    self._participants_by_code[speaker]
+                )
+            result.append(
+                ConversationLine(
+                    conversation_code,
+                    tu_id,
+                    participant,
+                    texts[i],
+                    words[word_bounds[i] : word_bounds[i + 1]],
+                )
+            )
+
+        is_spoken_word = ~np.isin(speakers[is_word], tuple(_NON_SPEAKERS))
+        tokens = build_token_table(
+            conversation_code,
+            tu_ids=tu_ids[is_word][is_spoken_word],
+            participant_codes=speakers[is_word][is_spoken_word],
+            forms=word_df["form"].to_numpy()[is_spoken_word],
+            types=word_df["type"].to_numpy()[is_spoken_word],
+            variations=word_df["variation"].to_numpy()[is_spoken_word],
+            jefferson_masks=jefferson_mask_array(jefferson_masks)[is_spoken_word],
+        )
+        return pd.Series(result), list(participants_by_code.values()), tokens
+
+    def _build_lines_iteratively(
+        self, conversation_code: str, kp_df: pd.DataFrame, kp_vert_df: pd.DataFrame
+    ) -> tuple[pd.Series, list[Participant], pd.DataFrame]:
         result = []
         normalised_words = []
         participants = set()
+        tokens = TokenTableBuilder(conversation_code)
         kp_rows = kp_df.itertuples()
         current_tu_id = 0
 
@@ -204,7 +348,7 @@ class ConversationParser:
             if current_tu_id != tu_id:
                 kp_row = next(kp_rows)
                 if row.speaker not in _NON_SPEAKERS:
-                    participant = self._participants[speaker]
+                    participant = self._participants_by_code[speaker]
                     participants.add(participant)
                     conversation_line = ConversationLine(
                         conversation_code,
@@ -219,35 +363,78 @@ class ConversationParser:
                 current_tu_id = tu_id
 
             if isinstance(word, str):
+                word_type = cast(str, row.type)
+                variation = cast(str, row.variation)
+                raw_features = row.jefferson_feats
+                if not isinstance(raw_features, str):
+                    raw_features = _NO_JEFFERSON_FEATURES
+                jefferson_mask = jefferson_features_vocabulary.encode(
+                    raw_features.split("|")
+                )
                 normalised_words.append(
                     AttributedWord(
                         word,
-                        word_type=cast(str, row.type),
-                        jefferson_features=cast(str, row.jefferson_feats).split('|'),
-                        variation=cast(str, row.variation),
+                        word_type=word_type,
+                        jefferson_features=jefferson_mask,
+                        variation=variation,
                     )
                 )
+                if speaker not in _NON_SPEAKERS:
+                    tokens.append(
+                        cast(int, tu_id),
+                        speaker,
+                        word,
+                        word_type,
+                        variation,
+                        jefferson_mask,
+                    )
 
-        return Conversation(
-            conversation_code,
-            list(participants),
-            frozenset(languages),
-            macro_region,
-            region,
-            pd.Series(result),
-        )
+        return pd.Series(result), list(participants), tokens.build()
 
-    def _conversation_metadata(self, code: str) -> pd.Series:
-        matching_code = self._conversations_df[self._conversations_df["code"] == code]
+    def _conversation_metadata(self, code: str) -> dict[str, Any]:
         try:
-            return matching_code.iloc[0]
-        except IndexError:
+            return self._metadata_by_code[code]
+        except KeyError:
             raise ValueError(f"Unknown conversation code {code!r}") from None
 
+    def _conversation_paths(self) -> dict[str, tuple[Path, Path]]:
+        # The data folder is scanned once, the first time a conversation is read
+        if self._paths_by_code is not None:
+            return self._paths_by_code
+
+        paths: dict[str, Path] = {}
+        vert_paths: dict[str, Path] = {}
+        for path in self._data_path.iterdir():
+            if (match := _CONVERSATION_FILE_PATTERN.fullmatch(path.name)) is not None:
+                paths[match.group(1)] = path
+            elif (
+                match := _CONVERSATION_VERT_FILE_PATTERN.fullmatch(path.name)
+            ) is not None:
+                vert_paths[match.group(1)] = path
+
+        self._paths_by_code = {
+            code: (path, vert_paths[code])
+            for code, path in sorted(paths.items())
+            if code in vert_paths
+        }
+        return self._paths_by_code
+
+
+@dataclass
+class ReadReport:
+    scoring: Optional[ScoringReport] = None
+    tagging: Optional[TaggingReport] = None
+
+    def __str__(self) -> str:
+        return "\n".join(
+            str(report) for report in (self.scoring, self.tagging) if report is not None
+        )
+
 
 class Conversations:
-    def __init__(self, participants: Participants):
-        self._parser = ConversationParser(participants)
+    def __init__(self, participants: Participants, data_path: Path = KIPASTI_DATA_PATH):
+        self._participants = participants
+        self._parser = ConversationParser(participants, data_path)
         self._conversations: dict[str, Conversation] = {}
 
     def __len__(self) -> int:
@@ -279,58 +466,267 @@ class Conversations:
         load_sentiments: bool = False,
         load_tagged: bool = False,
         load_prosodic: bool = False,
-        parallel_batches: Optional[bool] = None,
-    ):
-        assert load_sentiments + load_tagged + load_prosodic <= 1
-        parallel_batches = (
-            parallel_batches if parallel_batches is not None else parallel
-        )
-
-        tasks = []
-        for path in KIPASTI_DATA_PATH.iterdir():
-            if (match := _CONVERSATION_FILE_PATTERN.fullmatch(path.name)) is None:
-                continue
+        processes: bool = False,
+        max_workers: Optional[int] = None,
+        sentiment_backend: Optional[ScoringBackend] = None,
+    ) -> ReadReport:
+        if processes:
+            if parallel:
+                raise ValueError(
+                    "Reading in processes is already parallel, `parallel` can't be "
+                    "combined with `processes`"
+                )
+            return self._read_all_in_processes(
+                progress_bar=progress_bar,
+                load_sentiments=load_sentiments,
+                load_tagged=load_tagged,
+                load_prosodic=load_prosodic,
+                max_workers=max_workers,
+                sentiment_backend=sentiment_backend,
+            )
 
-            code = match.group(1)
+        for code in self._parser.conversation_codes():
             if (conversation := self._conversations.get(code)) is None:
                 self._conversations[code] = conversation = (
                     self._parser.parse_conversation(code)
                 )
+            if load_prosodic:
+                conversation.load_prosodic()
+
+        # Scoring and tagging are batched over the whole corpus at once, so
+        # that every distinct text is only processed once and the worker
+        # processes are only started once
+        report = ReadReport()
+        if load_sentiments:
+            if sentiment_backend is None:
+                sentiment_backend = (
+                    ScoringBackend.THREADS if parallel else ScoringBackend.SERIAL
+                )
+            report.scoring = score_lines(
+                itertools.chain.from_iterable(self),
+                backend=sentiment_backend,
+                max_workers=max_workers,
+                progress_bar=progress_bar,
+            )
+        if load_tagged:
+            report.tagging = tag_lines(
+                itertools.chain.from_iterable(self),
+                n_process=(max_workers or os.cpu_count() or 1) if parallel else 1,
+                progress_bar=progress_bar,
+            )
+            flush_tag_cache()
+        return report
 
-            if not load_sentiments and not load_tagged and not load_prosodic:
-                continue
-
-            if not parallel:
-                if load_sentiments:
-                    conversation.load_sentiment_scores(progress_bar=progress_bar)
-                elif load_prosodic:
-                    conversation.load_prosodic()
-                else:
-                    conversation.load_tagged()
-            else:
-                if load_sentiments:
-                    tasks.append((
-                        conversation.load_sentiment_scores,
-                        dict(progress_bar=progress_bar, parallel=parallel_batches),
-                    ))
-                elif load_prosodic:
-                    tasks.append((
-                        conversation.load_prosodic,
-                        dict(parallel=parallel_batches),
-                    ))
-                else:
-                    tasks.append((
-                        conversation.load_tagged,
-                        dict(parallel=parallel_batches, progress_bar=progress_bar),
-                    ))
-
-        if not parallel:
-            return
-
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            futures = [executor.submit(func, **kwargs) for func, kwargs in tasks]
+    def _read_all_in_processes(
+        self,
+        *,
+        progress_bar: bool,
+        load_sentiments: bool,
+        load_tagged: bool,
+        load_prosodic: bool,
+        max_workers: Optional[int],
+        sentiment_backend: Optional[ScoringBackend],
+    ) -> ReadReport:
+        start = time.perf_counter()
+        if load_sentiments:
+            load_polarity_scores()
+
+        # Conversations that were already read are loaded here, since replacing
+        # them would break references held by the caller
+        scoring_reports: list[ScoringReport] = []
+        tagging_reports: list[TaggingReport] = []
+        for conversation in self:
+            scoring, tagging = _load_conversation(
+                conversation,
+                load_sentiments=load_sentiments,
+                load_tagged=load_tagged,
+                load_prosodic=load_prosodic,
+                sentiment_backend=sentiment_backend,
+            )
+            scoring_reports.extend(filter(None, (scoring,)))
+            tagging_reports.extend(filter(None, (tagging,)))
+
+        codes = [
+            code
+            for code in self._parser.conversation_codes()
+            if code not in self._conversations
+        ]
+
+        pbar = (
+            tqdm(
+                total=len(codes),
+                desc="conversations",
+                unit="conversations",
+                dynamic_ncols=True,
+                colour=random_hex_colour(),
+            )
+            if progress_bar
+            else None
+        )
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers,
+            initializer=_init_worker,
+            initargs=(self._participants.metadata_path, self._parser.data_path),
+        ) as executor:
+            futures = [
+                executor.submit(
+                    _read_conversation_in_worker,
+                    code,
+                    load_sentiments=load_sentiments,
+                    load_tagged=load_tagged,
+                    load_prosodic=load_prosodic,
+                    sentiment_backend=sentiment_backend,
+                )
+                for code in codes
+            ]
             for future in concurrent.futures.as_completed(futures):
-                future.result()
+                conversation, feature_names, scoring, tagging = future.result()
+                self._conversations[conversation.code] = conversation = (
+                    self._adopt_conversation(conversation, feature_names)
+                )
+                scoring_reports.extend(filter(None, (scoring,)))
+                if tagging is not None:
+                    # Workers don't write the tag cache, so the tags of every
+                    # worker end up in it
+                    tagging_reports.append(tagging)
+                    store_tags(
+                        (line.tagging_text, line.tagged) for line in conversation
+                    )
+                if pbar is not None:
+                    pbar.update(1)
+        flush_tag_cache()
+
+        if pbar is not None:
+            pbar.close()
+        elapsed = time.perf_counter() - start
+        return ReadReport(
+            ScoringReport.combine(scoring_reports, elapsed),
+            TaggingReport.combine(tagging_reports, elapsed),
+        )
+
+    def _adopt_conversation(
+        self, conversation: Conversation, feature_names: list[str]
+    ) -> Conversation:
+        # Conversations read in another process come with their own copies of
+        # every participant and their own Jefferson feature bit positions
+        conversation.participants = [
+            self._participants[participant.code]
+            for participant in conversation.participants
+        ]
+        for line in conversation:
+            line.participant = self._participants[line.participant.code]
+        conversation.tokens = remap_jefferson_masks(conversation.tokens, feature_names)
+        return conversation
+
+    def save_snapshot(self, path: Path = SNAPSHOT_PATH):
+        save_snapshot(self, self._sources_fingerprint(), path)
+
+    def load_snapshot(self, path: Path = SNAPSHOT_PATH) -> bool:
+        # Conversations that were already read are kept as they are. Returns
+        # False when the snapshot is missing, or stale because the KIParla
+        # sources changed since it was saved.
+        conversations = load_snapshot(
+            self._participants.__getitem__, self._sources_fingerprint(), path
+        )
+        if conversations is None:
+            return False
+
+        for conversation in conversations:
+            self._conversations.setdefault(conversation.code, conversation)
+        return True
+
+    def _sources_fingerprint(self) -> str:
+        return sources_fingerprint(
+            self._parser.data_path, self._participants.metadata_path
+        )
+
+    def token_table(self) -> pd.DataFrame:
+        # Covers the conversations read so far, with the attributes of each
+        # token's participant added as categorical columns
+        table = concat_token_tables(conversation.tokens for conversation in self)
+        return self._with_participant_columns(table)
+
+    def dialect_word_counts(
+        self, by: str | list[str] = "generation", strict: bool = True
+    ) -> pd.DataFrame:
+        table = self.token_table()
+        linguistic_tokens = table[table["is_linguistic"]]
+        dialect_column = "is_strict_dialect" if strict else "is_dialect"
+        counts = linguistic_tokens.groupby(by, observed=True).agg(
+            n_words=(dialect_column, "size"), n_dialect_words=(dialect_column, "sum")
+        )
+        counts["dialect_percentage"] = (
+            counts["n_dialect_words"] / counts["n_words"] * 100
+        )
+        return counts
+
+    def prosodic_table(self, valid_sentiments: bool = False) -> pd.DataFrame:
+        # Covers the conversations whose prosodic features were loaded, with the
+        # same participant attribute columns as `token_table`
+        tables = []
+        for conversation in self:
+            table = conversation.prosody
+            if valid_sentiments and len(table):
+                table = table[[line.sentiments.has_scores() for line in conversation]]
+            tables.append(table)
+
+        table = (
+            pd.concat(tables, ignore_index=True) if tables else empty_prosodic_table()
+        )
+        for column in ("conversation_code", "participant_code"):
+            table[column] = table[column].astype("category")
+        return self._with_participant_columns(table)
+
+    def prosodic_frequencies(
+        self,
+        by: str | list[str] = "generation",
+        features: Iterable[str] = PROSODIC_FEATURES,
+        valid_sentiments: bool = False,
+    ) -> pd.DataFrame:
+        # Percentage of phrases per line of each participant, averaged over the
+        # participants of every group. Like `participant_lines`, a participant
+        # only counts in their own conversation, and one without lines there
+        # counts as 0. Keeping only the lines with valid sentiments scores every
+        # line that has no scores yet, so it is best done once the sentiments
+        # were loaded
+        table = self.prosodic_table(valid_sentiments=valid_sentiments)
+        features = list(features)
+        by = [by] if isinstance(by, str) else by
+        participants = [
+            participant
+            for participant in self._participants
+            if participant.conversation_code in self._conversations
+        ]
+        conversation_codes = {
+            participant.code: participant.conversation_code
+            for participant in participants
+        }
+        in_own_conversation = table["conversation_code"].astype(str) == table[
+            "participant_code"
+        ].astype(str).map(conversation_codes)
+        participant_frequencies = (
+            table[in_own_conversation]
+            .groupby("participant_code", observed=True)[features]
+            .mean()
+            .reindex([participant.code for participant in participants], fill_value=0.0)
+            * 100
+        )
+        for column in by:
+            get_attribute = _PARTICIPANT_COLUMNS[column]
+            participant_frequencies[column] = [
+                get_attribute(participant) for participant in participants
+            ]
+        return participant_frequencies.groupby(by).mean()
+
+    def _with_participant_columns(self, table: pd.DataFrame) -> pd.DataFrame:
+        participant_codes = table["participant_code"]
+        for column, get_attribute in _PARTICIPANT_COLUMNS.items():
+            attributes = {
+                participant.code: get_attribute(participant)
+                for participant in self._participants
+            }
+            table[column] = participant_codes.map(attributes).astype("category")
+        return table
 
     def participant_lines(self, participant: Participant) -> ParticipantLines:
         conversation = self.conversation(participant.conversation_code)
@@ -347,3 +743,51 @@ class Conversations:
                 word for word in line.normalised_words if word.is_dialect(strict=strict)
             )
         return dialect_words
+
+
+def _load_conversation(
+    conversation: Conversation,
+    *,
+    load_sentiments: bool,
+    load_tagged: bool,
+    load_prosodic: bool,
+    sentiment_backend: Optional[ScoringBackend],
+) -> tuple[Optional[ScoringReport], Optional[TaggingReport]]:
+    scoring = (
+        conversation.load_sentiment_scores(backend=sentiment_backend)
+        if load_sentiments
+        else None
+    )
+    tagging = conversation.load_tagged() if load_tagged else None
+    if load_prosodic:
+        conversation.load_prosodic()
+    return scoring, tagging
+
+
+_worker_parser: Optional[ConversationParser] = None
+
+
+def _init_worker(metadata_path: Path, data_path: Path):
+    global _worker_parser
+    _worker_parser = ConversationParser(Participants(metadata_path), data_path)
+    make_tag_caches_read_only()
+
+
+def _read_conversation_in_worker(
+    code: str,
+    *,
+    load_sentiments: bool,
+    load_tagged: bool,
+    load_prosodic: bool,
+    sentiment_backend: Optional[ScoringBackend],
+) -> tuple[Conversation, list[str], Optional[ScoringReport], Optional[TaggingReport]]:
+    assert _worker_parser is not None, "Worker was not initialised"
+    conversation = _worker_parser.parse_conversation(code)
+    scoring, tagging = _load_conversation(
+        conversation,
+        load_sentiments=load_sentiments,
+        load_tagged=load_tagged,
+        load_prosodic=load_prosodic,
+        sentiment_backend=sentiment_backend,
+    )
+    return conversation, list(jefferson_features_vocabulary), scoring, tagging
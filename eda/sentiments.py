@@ -1,93 +1,701 @@
+import atexit
+import concurrent.futures
 import enum
 import hashlib
+import itertools
 import json
+import os
+import string
+import tempfile
+import threading
 import time
 from collections import Counter
+from collections.abc import Generator, Iterable, Iterator, Sequence
+from contextlib import contextmanager, nullcontext
 from dataclasses import dataclass
 from functools import cached_property
 from pathlib import Path
 from typing import Final, Optional, Self, cast
 from urllib.error import HTTPError, URLError
 
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-
-from eda.llm import translate_llm
-from eda.utils import FOLDER_DIR
+import numpy as np
+import vaderSentiment.vaderSentiment
+from vaderSentiment.vaderSentiment import (
+    BOOSTER_DICT,
+    N_SCALAR,
+    NEGATE,
+    SentimentIntensityAnalyzer,
+)
+
+try:
+    from vaderSentiment.vaderSentiment import SPECIAL_CASES
+except ImportError:
+    # vader_multi replaces the module with an older VADER, which names its idioms
+    # differently and translates every text to English before scoring it
+    from vaderSentiment.vaderSentiment import SPECIAL_CASE_IDIOMS as SPECIAL_CASES
+
+from eda.llm import translate_llm, translate_many
+from eda.utils import FOLDER_DIR, write_atomic
 
 type PolarityScores = dict[str, float]
 type ScoresEntry = dict[str, Optional[str | PolarityScores]]
 
 INDETERMINATE_SCORES = {"pos": -5.0, "neg": -5.0, "neu": -5.0, "compound": -5.0}
 
+SCORES_PATH = FOLDER_DIR / "scores"
+
 
 def encode_text_hashed(text: str) -> str:
     return hashlib.sha256(text.encode(encoding="utf-8")).hexdigest()
 
 
-class _PolarityScoresCache:
-    def __init__(self):
-        self._analyser = SentimentIntensityAnalyzer()
+class _PolarityScoresStore:
+    # Scores are keyed by the hash of the scored text only, so a text repeated
+    # across conversations is scored once. They are kept in memory once loaded
+    # and persisted as an append-only log, so scoring a line never rewrites
+    # every score. The older per-conversation `polarity_scores_<code>.json(l)`
+    # files are merged in (but never written) the first time the log is
+    # created, so previously computed scores are kept.
+    def __init__(self, path: Path):
+        self._path = path
+        self._lock = threading.RLock()
+        self._entries: Optional[dict[str, ScoresEntry]] = None
+        self._pending: dict[str, ScoresEntry] = {}
 
-    def get(self, text: str, conversation_code: str) -> PolarityScores:
-        scores_by_text = self._load_entries(conversation_code)
-        hashed_text = encode_text_hashed(text)
-        if hashed_text in scores_by_text:
-            return cast(PolarityScores, scores_by_text[hashed_text]["scores"])
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._load())
+
+    def __contains__(self, hashed_text: str) -> bool:
+        with self._lock:
+            return hashed_text in self._load()
+
+    @property
+    def n_pending(self) -> int:
+        return len(self._pending)
+
+    @property
+    def log_path(self) -> Path:
+        return self._path
 
+    @property
+    def legacy_paths(self) -> list[Path]:
+        return sorted(self._path.parent.glob("polarity_scores_*.json")) + sorted(
+            self._path.parent.glob("polarity_scores_*.jsonl")
+        )
+
+    def lookup(self, hashed_text: str) -> Optional[ScoresEntry]:
+        with self._lock:
+            return self._load().get(hashed_text)
+
+    def add(self, hashed_text: str, entry: ScoresEntry) -> ScoresEntry:
+        with self._lock:
+            entries = self._load()
+            if (existing_entry := entries.get(hashed_text)) is not None:
+                # Another thread scored the same text first
+                return existing_entry
+            entries[hashed_text] = self._pending[hashed_text] = entry
+            return entry
+
+    def flush(self):
+        with self._lock:
+            if not self._pending:
+                return
+
+            # Everything pending is appended with a single unbuffered write, so a
+            # crash can at most leave one truncated record at the end of the log,
+            # and processes sharing the log don't interleave their records
+            records = "".join(
+                json.dumps({"hash": hashed_text, **entry}, ensure_ascii=False) + "\n"
+                for hashed_text, entry in self._pending.items()
+            )
+            self.log_path.parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(self.log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, records.encode("utf-8"))
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            self._pending.clear()
+
+    def load(self):
+        with self._lock:
+            self._load()
+
+    def compact(self):
+        with self._lock:
+            entries = self._load()
+            records = "".join(
+                json.dumps({"hash": hashed_text, **entry}, ensure_ascii=False) + "\n"
+                for hashed_text, entry in entries.items()
+            )
+            write_atomic(self.log_path, records)
+            self._pending.clear()
+
+    def _load(self) -> dict[str, ScoresEntry]:
+        if self._entries is not None:
+            return self._entries
+
+        entries: dict[str, ScoresEntry] = {}
+        if self.log_path.exists():
+            needs_compaction = _read_scores_log(self.log_path, entries)
+        else:
+            for legacy_path in self.legacy_paths:
+                if legacy_path.suffix == ".jsonl":
+                    _read_scores_log(legacy_path, entries)
+                    continue
+                with legacy_path.open("r", encoding="utf-8") as saved_scores:
+                    try:
+                        for hashed_text, entry in json.load(saved_scores).items():
+                            entries.setdefault(hashed_text, entry)
+                    except json.JSONDecodeError:
+                        pass
+            # The merged legacy scores become the start of the log
+            needs_compaction = bool(entries)
+
+        self._entries = entries
+        if needs_compaction:
+            self.compact()
+        return entries
+
+
+def _read_scores_log(path: Path, entries: dict[str, ScoresEntry]) -> bool:
+    # Returns whether some records could not be read
+    has_invalid_records = False
+    with path.open("r", encoding="utf-8") as log:
+        for raw_record in filter(str.strip, log):
+            try:
+                record = json.loads(raw_record)
+            except json.JSONDecodeError:
+                has_invalid_records = True
+                continue
+            entries.setdefault(record.pop("hash"), record)
+    return has_invalid_records
+
+
+def _score_untranslated(
+    analyser: SentimentIntensityAnalyzer, text: str
+) -> Optional[PolarityScores]:
+    # None when VADER can't score the text as it is, which then has to be
+    # translated first
+    for _ in range(3):
         try:
-            retries = 0
-            while True:
-                try:
-                    scores = self._analyser.polarity_scores(text)
-                except (HTTPError, URLError):
-                    time.sleep(0.5)
-                else:
-                    break
-
-                if retries == 3:
-                    raise ValueError
+            return analyser.polarity_scores(text)
+        except (HTTPError, URLError):
+            time.sleep(0.5)
         except (IndexError, ValueError):
-            retries = 0
-            while True:
-                translated_text = translate_llm(text)
-                try:
-                    scores = self._analyser.polarity_scores(text)
-                except IndexError:
-                    retries += 1
-                else:
-                    break
-
-                if retries == 3:
-                    scores = INDETERMINATE_SCORES
-                    translated_text = None
-                    break
-            entry = {"scores": scores, "translation": translated_text}
-        else:
-            entry = {"scores": scores}
+            return None
+    return None
+
+
+def _score_translation(
+    analyser: SentimentIntensityAnalyzer, translated_text: str
+) -> ScoresEntry:
+    # Translations are cached, so scoring one again would fail the same way
+    try:
+        scores = analyser.polarity_scores(translated_text)
+    except IndexError:
+        return {"scores": INDETERMINATE_SCORES, "translation": None}
+    return {"scores": scores, "translation": translated_text}
+
+
+def _score_text(analyser: SentimentIntensityAnalyzer, text: str) -> ScoresEntry:
+    if (scores := _score_untranslated(analyser, text)) is not None:
+        return {"scores": scores}
+    return _score_translation(analyser, translate_llm(text))
+
+
+def _score_texts(
+    analyser: SentimentIntensityAnalyzer,
+    texts: Sequence[str],
+    executor: Optional[concurrent.futures.Executor] = None,
+) -> list[ScoresEntry]:
+    # Like `_score_text` for every text, except that the texts VADER can't score
+    # as they are are translated together, in batches of concurrent requests
+    scores_by_text = list(
+        (map if executor is None else executor.map)(
+            lambda text: _score_untranslated(analyser, text), texts
+        )
+    )
+    untranslated_texts = [
+        text
+        for text, scores in zip(texts, scores_by_text, strict=True)
+        if scores is None
+    ]
+    translations = iter(
+        translate_many(untranslated_texts) if untranslated_texts else ()
+    )
+    return [
+        {"scores": scores}
+        if scores is not None
+        else _score_translation(analyser, next(translations))
+        for scores in scores_by_text
+    ]
+
+
+# Token flags of the lexicon scorer
+_IN_LEXICON: Final = 1 << 0
+_BOOSTER: Final = 1 << 1
+_NEGATION: Final = 1 << 2
+_NO: Final = 1 << 3
+_OR_NOR: Final = 1 << 4
+_NEVER: Final = 1 << 5
+_SO_THIS: Final = 1 << 6
+_WITHOUT: Final = 1 << 7
+_DOUBT: Final = 1 << 8
+_UPPER: Final = 1 << 9
+_UNSUPPORTED: Final = 1 << 10
+
+# Whether the installed analyser translates texts before scoring them, which
+# only it can do
+_ANALYSER_TRANSLATES: Final = hasattr(vaderSentiment.vaderSentiment, "Translator")
+
+# Multi-word idioms and boosters, which only VADER itself handles
+_PHRASES: Final = tuple(
+    phrase for phrase in (*SPECIAL_CASES, *BOOSTER_DICT) if " " in phrase
+)
+_PHRASE_WORD_IDS: Final = {
+    word: i
+    for i, word in enumerate(
+        dict.fromkeys(word for phrase in _PHRASES for word in phrase.split())
+    )
+}
+
+
+class LexiconScorer:
+    # Scores texts exactly like VADER's `polarity_scores`, but applies its
+    # lexicon, booster, negation and normalisation rules to every token of every
+    # text at once. Texts that need its rarer rules (emojis, words in caps,
+    # "but", "least" and multi-word idioms) are scored by VADER itself, and so
+    # is every text when the installed VADER translates them (vader_multi).
+    def __init__(self, analyser: Optional[SentimentIntensityAnalyzer] = None):
+        self._analyser = analyser or SentimentIntensityAnalyzer()
+        # VADER replaces emojis character by character
+        self._emojis = frozenset(
+            emoji for emoji in self._analyser.emojis if len(emoji) == 1
+        )
+        self._vocabulary: dict[str, int] = {}
+        self._flags: list[int] = []
+        self._valences: list[float] = []
+        self._boosts: list[float] = []
+        self._phrase_words: list[int] = []
+
+    def __call__(self, texts: Sequence[str]) -> list[PolarityScores]:
+        if _ANALYSER_TRANSLATES:
+            return [
+                cast(PolarityScores, _score_text(self._analyser, text)["scores"])
+                for text in texts
+            ]
+
+        tokens_by_text = [text.split() for text in texts]
+        lengths = np.fromiter(map(len, tokens_by_text), dtype=np.int64)
+        tokens = list(itertools.chain.from_iterable(tokens_by_text))
+        for token in set(tokens).difference(self._vocabulary):
+            self._add_token(token)
+        token_ids = np.fromiter(
+            map(self._vocabulary.__getitem__, tokens), dtype=np.int64, count=len(tokens)
+        )
+
+        flags = np.asarray(self._flags, dtype=np.int64)[token_ids]
+        valences = np.asarray(self._valences)[token_ids]
+        boosts = np.asarray(self._boosts)[token_ids]
+        phrase_words = np.asarray(self._phrase_words, dtype=np.int64)[token_ids]
+        text_indices = np.repeat(np.arange(len(texts)), lengths)
+        positions = np.arange(len(tokens)) - np.repeat(
+            np.cumsum(lengths) - lengths, lengths
+        )
+
+        def shifted(values: np.ndarray, by: int) -> np.ndarray:
+            # Value of the token `by` places before each token, or 0 past the
+            # start of its text
+            result = np.zeros_like(values)
+            result[by:] = values[: len(values) - by]
+            result[positions < by] = 0
+            return result
+
+        def has(token_flags: np.ndarray, flag: int) -> np.ndarray:
+            return (token_flags & flag) != 0
+
+        previous_flags = [None, *(shifted(flags, by) for by in (1, 2, 3))]
+        previous_boosts = [None, *(shifted(boosts, by) for by in (1, 2, 3))]
+        next_flags = np.zeros_like(flags)
+        next_flags[:-1] = flags[1:]
+        next_flags[np.cumsum(lengths)[lengths > 0] - 1] = 0
+
+        # Booster words are never scored, even when they are in the lexicon
+        is_scored = has(flags, _IN_LEXICON) & ~has(flags, _BOOSTER)
+        sentiments = np.where(is_scored, valences, 0.0)
+        sentiments[is_scored & has(flags, _NO) & has(next_flags, _IN_LEXICON)] = 0.0
+        negated_by_no = (
+            has(previous_flags[1], _NO)
+            | has(previous_flags[2], _NO)
+            | (has(previous_flags[3], _NO) & has(previous_flags[1], _OR_NOR))
+        )
+        sentiments = np.where(
+            is_scored & negated_by_no, valences * N_SCALAR, sentiments
+        )
 
-        scores_by_text[hashed_text] = cast(ScoresEntry, entry)
-        self._save_entries(conversation_code, scores_by_text)
-        return scores
+        for by, dampening in ((1, None), (2, 0.95), (3, 0.9)):
+            applies = (
+                is_scored & (positions >= by) & ~has(previous_flags[by], _IN_LEXICON)
+            )
+            scalars = np.where(
+                sentiments < 0, previous_boosts[by] * -1, previous_boosts[by]
+            )
+            if dampening is not None:
+                scalars = np.where(scalars != 0, scalars * dampening, scalars)
+            sentiments = np.where(applies, sentiments + scalars, sentiments)
+
+            match by:
+                case 1:
+                    emphasised = np.zeros_like(applies)
+                    kept = np.zeros_like(applies)
+                case 2:
+                    emphasised = has(previous_flags[2], _NEVER) & has(
+                        previous_flags[1], _SO_THIS
+                    )
+                    kept = has(previous_flags[2], _WITHOUT) & has(
+                        previous_flags[1], _DOUBT
+                    )
+                case _:
+                    emphasised = (
+                        has(previous_flags[3], _NEVER)
+                        & has(previous_flags[2], _SO_THIS)
+                    ) | has(previous_flags[1], _SO_THIS)
+                    kept = has(previous_flags[3], _WITHOUT) & (
+                        has(previous_flags[2], _DOUBT) | has(previous_flags[1], _DOUBT)
+                    )
+            negated = has(previous_flags[by], _NEGATION) & ~emphasised & ~kept
+            sentiments = np.where(applies & emphasised, sentiments * 1.25, sentiments)
+            sentiments = np.where(applies & negated, sentiments * N_SCALAR, sentiments)
+
+        n_texts = len(texts)
+        sums = np.bincount(text_indices, weights=sentiments, minlength=n_texts)
+        positive_sums = np.bincount(
+            text_indices,
+            weights=np.where(sentiments > 0, sentiments + 1, 0.0),
+            minlength=n_texts,
+        )
+        negative_sums = np.bincount(
+            text_indices,
+            weights=np.where(sentiments < 0, sentiments - 1, 0.0),
+            minlength=n_texts,
+        )
+        neutral_counts = np.bincount(
+            text_indices, weights=sentiments == 0, minlength=n_texts
+        )
 
-    def _get_scores_path(self, conversation_code: str) -> Path:
-        path = FOLDER_DIR / "scores" / f"polarity_scores_{conversation_code}.json"
-        path.parent.mkdir(parents=True, exist_ok=True)
-        return path
+        n_exclamation_marks = np.fromiter(
+            (text.count("!") for text in texts), dtype=np.int64, count=n_texts
+        )
+        n_question_marks = np.fromiter(
+            (text.count("?") for text in texts), dtype=np.int64, count=n_texts
+        )
+        amplifiers = np.minimum(n_exclamation_marks, 4) * 0.292 + np.select(
+            [n_question_marks <= 1, n_question_marks <= 3],
+            [0.0, n_question_marks * 0.18],
+            0.96,
+        )
 
-    def _load_entries(self, conversation_code: str) -> dict[str, ScoresEntry]:
-        scores_path = self._get_scores_path(conversation_code)
-        if not scores_path.exists():
-            scores_path.write_text(json.dumps({}, indent=4))
-        with scores_path.open("r") as saved_scores:
-            return json.load(saved_scores)
+        sums = np.where(
+            sums > 0, sums + amplifiers, np.where(sums < 0, sums - amplifiers, sums)
+        )
+        compounds = np.clip(sums / np.sqrt(sums * sums + 15), -1.0, 1.0)
+        positive_sums = np.where(
+            positive_sums > np.abs(negative_sums),
+            positive_sums + amplifiers,
+            positive_sums,
+        )
+        negative_sums = np.where(
+            positive_sums < np.abs(negative_sums),
+            negative_sums - amplifiers,
+            negative_sums,
+        )
+        totals = positive_sums + np.abs(negative_sums) + neutral_counts
+        with np.errstate(invalid="ignore", divide="ignore"):
+            positives = np.abs(positive_sums / totals)
+            negatives = np.abs(negative_sums / totals)
+            neutrals = np.abs(neutral_counts / totals)
+
+        n_upper = np.bincount(
+            text_indices, weights=has(flags, _UPPER), minlength=n_texts
+        )
+        needs_vader = ((n_upper > 0) & (n_upper < lengths)) | (
+            np.bincount(
+                text_indices, weights=has(flags, _UNSUPPORTED), minlength=n_texts
+            )
+            > 0
+        )
+        has_phrase = np.zeros(len(tokens), dtype=bool)
+        for phrase in _PHRASES:
+            *previous_words, last_word = phrase.split()
+            matches = phrase_words == _PHRASE_WORD_IDS[last_word]
+            for by, word in enumerate(reversed(previous_words), start=1):
+                matches &= shifted(phrase_words, by) == _PHRASE_WORD_IDS[word]
+                matches &= positions >= by
+            has_phrase |= matches
+        needs_vader = (
+            needs_vader
+            | (np.bincount(text_indices, weights=has_phrase, minlength=n_texts) > 0)
+        ).tolist()
+
+        results = []
+        for i, (text, n_tokens) in enumerate(zip(texts, lengths.tolist(), strict=True)):
+            if needs_vader[i]:
+                results.append(self._analyser.polarity_scores(text))
+            elif not n_tokens:
+                results.append({"neg": 0.0, "neu": 0.0, "pos": 0.0, "compound": 0.0})
+            else:
+                # Rounded as Python floats, like VADER does
+                results.append({
+                    "neg": round(float(negatives[i]), 3),
+                    "neu": round(float(neutrals[i]), 3),
+                    "pos": round(float(positives[i]), 3),
+                    "compound": round(float(compounds[i]), 4),
+                })
+        return results
+
+    def _add_token(self, token: str):
+        # Leading and trailing punctuation is stripped unless that leaves at
+        # most two characters, which keeps emoticons like ":)" whole
+        stripped = token.strip(string.punctuation)
+        word = token if len(stripped) <= 2 else stripped
+        lowercased = word.lower()
+        lexicon = self._analyser.lexicon
+
+        flags = 0
+        for flag, is_set in (
+            (_IN_LEXICON, lowercased in lexicon),
+            (_BOOSTER, lowercased in BOOSTER_DICT),
+            (_NEGATION, lowercased in NEGATE or "n't" in lowercased),
+            (_NO, lowercased == "no"),
+            (_OR_NOR, lowercased in ("or", "nor")),
+            (_NEVER, lowercased == "never"),
+            (_SO_THIS, lowercased in ("so", "this")),
+            (_WITHOUT, lowercased == "without"),
+            (_DOUBT, lowercased == "doubt"),
+            (_UPPER, word.isupper()),
+            (
+                _UNSUPPORTED,
+                lowercased in ("but", "least") or not self._emojis.isdisjoint(token),
+            ),
+        ):
+            if is_set:
+                flags |= flag
+
+        self._vocabulary[token] = len(self._flags)
+        self._flags.append(flags)
+        self._valences.append(lexicon.get(lowercased, 0.0))
+        self._boosts.append(BOOSTER_DICT.get(lowercased, 0.0))
+        self._phrase_words.append(_PHRASE_WORD_IDS.get(lowercased, -1))
+
+
+class ScoringBackend(enum.StrEnum):
+    SERIAL = "serial"
+    # Rarely worth it, since VADER itself holds the GIL while scoring and texts
+    # that need translating are translated concurrently with every backend
+    THREADS = "threads"
+    PROCESSES = "processes"
+    LEXICON = "lexicon"
+
+
+_worker_analyser: Optional[SentimentIntensityAnalyzer] = None
+
+
+def _init_scoring_worker():
+    global _worker_analyser
+    _worker_analyser = SentimentIntensityAnalyzer()
+
+
+def _score_chunk(texts: Sequence[str]) -> list[ScoresEntry]:
+    assert _worker_analyser is not None, "Worker was not initialised"
+    return _score_texts(_worker_analyser, texts)
+
+
+def _score_in_processes(
+    texts: Sequence[str], *, max_workers: Optional[int], chunk_size: int
+) -> Iterator[tuple[str, ScoresEntry]]:
+    # Texts are sent in chunks, so that each task is worth its pickling, to
+    # workers that each load the VADER lexicon once
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers, initializer=_init_scoring_worker
+    ) as executor:
+        futures = {
+            executor.submit(_score_chunk, chunk): chunk
+            for chunk in itertools.batched(texts, chunk_size)
+        }
+        for future in concurrent.futures.as_completed(futures):
+            yield from zip(futures[future], future.result(), strict=True)
 
-    def _save_entries(self, conversation_code: str, scores: dict[str, ScoresEntry]):
-        scores_path = self._get_scores_path(conversation_code)
-        with scores_path.open("w") as saved_scores:
-            json.dump(scores, saved_scores, indent=4, ensure_ascii=False)
 
+class _PolarityScoresCache:
+    def __init__(self, path: Path, flush_every: int = 256):
+        self._analyser = SentimentIntensityAnalyzer()
+        self._flush_every = flush_every
+        self._store = _PolarityScoresStore(path)
+        self._lexicon_scorer: Optional[LexiconScorer] = None
 
-_polarity_scores_cache: Final = _PolarityScoresCache()
+    def __contains__(self, text: str) -> bool:
+        return encode_text_hashed(text) in self._store
+
+    def get(self, text: str) -> PolarityScores:
+        hashed_text = encode_text_hashed(text)
+        if (entry := self._store.lookup(hashed_text)) is not None:
+            return cast(PolarityScores, entry["scores"])
+
+        entry = _score_text(self._analyser, text)
+        entry = self._store.add(hashed_text, entry)
+        if self._store.n_pending >= self._flush_every:
+            self._store.flush()
+        return cast(PolarityScores, entry["scores"])
+
+    def get_many(
+        self,
+        texts: Iterable[str],
+        *,
+        backend: ScoringBackend,
+        max_workers: Optional[int] = None,
+        chunk_size: int = 256,
+    ) -> Iterator[tuple[str, PolarityScores]]:
+        # Yields the scores of every distinct text, cached ones first and then
+        # the others as they are scored, so not in the order of `texts`
+        missing_texts = []
+        for text in dict.fromkeys(texts):
+            if (entry := self._store.lookup(encode_text_hashed(text))) is not None:
+                yield text, cast(PolarityScores, entry["scores"])
+            else:
+                missing_texts.append(text)
+        if not missing_texts:
+            return
+
+        match backend:
+            case ScoringBackend.SERIAL | ScoringBackend.THREADS:
+                # Scored a chunk at a time, so the texts of each chunk that need
+                # translating are translated together
+                with (
+                    concurrent.futures.ThreadPoolExecutor(max_workers)
+                    if backend == ScoringBackend.THREADS
+                    else nullcontext()
+                ) as executor:
+                    for chunk in itertools.batched(missing_texts, chunk_size):
+                        yield from self._add_entries(
+                            zip(
+                                chunk,
+                                _score_texts(self._analyser, chunk, executor),
+                                strict=True,
+                            )
+                        )
+            case ScoringBackend.PROCESSES:
+                yield from self._add_entries(
+                    _score_in_processes(
+                        missing_texts, max_workers=max_workers, chunk_size=chunk_size
+                    )
+                )
+            case ScoringBackend.LEXICON:
+                if self._lexicon_scorer is None:
+                    self._lexicon_scorer = LexiconScorer(self._analyser)
+                for text, scores in zip(
+                    missing_texts, self._lexicon_scorer(missing_texts), strict=True
+                ):
+                    entry = self._store.add(
+                        encode_text_hashed(text), {"scores": scores}
+                    )
+                    yield text, cast(PolarityScores, entry["scores"])
+                self._store.flush()
+
+    def load(self):
+        self._store.load()
+
+    def flush(self):
+        self._store.flush()
+
+    def _add_entries(
+        self, entries: Iterable[tuple[str, ScoresEntry]]
+    ) -> Iterator[tuple[str, PolarityScores]]:
+        for text, entry in entries:
+            entry = self._store.add(encode_text_hashed(text), entry)
+            if self._store.n_pending >= self._flush_every:
+                self._store.flush()
+            yield text, cast(PolarityScores, entry["scores"])
+
+
+_polarity_scores_cache = _PolarityScoresCache(SCORES_PATH / "polarity_scores.jsonl")
+atexit.register(_polarity_scores_cache.flush)
+
+
+def polarity_scores(text: str) -> PolarityScores:
+    return _polarity_scores_cache.get(text)
+
+
+def has_cached_polarity_scores(text: str) -> bool:
+    return text in _polarity_scores_cache
+
+
+def load_polarity_scores():
+    # Reads the stored scores up front, e.g. before forking worker processes
+    # so that they don't each read (and possibly migrate) the store
+    _polarity_scores_cache.load()
+
+
+def polarity_scores_many(
+    texts: Iterable[str],
+    *,
+    backend: ScoringBackend = ScoringBackend.SERIAL,
+    max_workers: Optional[int] = None,
+    chunk_size: int = 256,
+) -> Iterator[tuple[str, PolarityScores]]:
+    return _polarity_scores_cache.get_many(
+        texts, backend=backend, max_workers=max_workers, chunk_size=chunk_size
+    )
+
+
+def score_texts(
+    texts: Sequence[str],
+    *,
+    backend: ScoringBackend = ScoringBackend.SERIAL,
+    max_workers: Optional[int] = None,
+    chunk_size: int = 256,
+) -> list[PolarityScores]:
+    # Scores every text without going through (or filling) the store, e.g. to
+    # compare backends
+    match backend:
+        case ScoringBackend.SERIAL:
+            entries = _score_texts(SentimentIntensityAnalyzer(), texts)
+        case ScoringBackend.THREADS:
+            with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+                entries = _score_texts(SentimentIntensityAnalyzer(), texts, executor)
+        case ScoringBackend.PROCESSES:
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers, initializer=_init_scoring_worker
+            ) as executor:
+                entries = list(
+                    itertools.chain.from_iterable(
+                        executor.map(_score_chunk, itertools.batched(texts, chunk_size))
+                    )
+                )
+        case ScoringBackend.LEXICON:
+            return LexiconScorer()(texts)
+    return [cast(PolarityScores, entry["scores"]) for entry in entries]
+
+
+def flush_polarity_scores():
+    _polarity_scores_cache.flush()
+
+
+@contextmanager
+def temporary_polarity_scores() -> Generator[Path]:
+    # Swaps the scores store for an empty one in a temporary directory, so
+    # every text is scored without touching the real store
+    global _polarity_scores_cache
+    _polarity_scores_cache.flush()
+    saved = _polarity_scores_cache
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory)
+        _polarity_scores_cache = _PolarityScoresCache(path / "polarity_scores.jsonl")
+        try:
+            yield path
+        finally:
+            _polarity_scores_cache = saved
 
 
 class SentimentType(enum.StrEnum):
@@ -123,9 +731,8 @@ class ScoredSentiment:
 
 
 class TextSentiments:
-    def __init__(self, text: str, conversation_code: str):
+    def __init__(self, text: str):
         self._text = text
-        self._conversation_code = conversation_code
         self._raw_scores: Optional[PolarityScores] = None
 
     def __repr__(self) -> str:
@@ -145,9 +752,7 @@ class TextSentiments:
     @property
     def _scores(self) -> PolarityScores:
         if self._raw_scores is None:
-            self._raw_scores = _polarity_scores_cache.get(
-                self._text, self._conversation_code
-            )
+            self._raw_scores = _polarity_scores_cache.get(self._text)
         return self._raw_scores
 
     @staticmethod
@@ -163,11 +768,20 @@ class TextSentiments:
     def has_loaded_scores(self) -> bool:
         return self._raw_scores is not None
 
+    @property
+    def text(self) -> str:
+        return self._text
+
+    @property
+    def loaded_scores(self) -> Optional[PolarityScores]:
+        return self._raw_scores
+
+    def restore_scores(self, scores: PolarityScores):
+        self._raw_scores = scores
+
     def load_scores(self):
         if self._raw_scores is None:
-            self._raw_scores = _polarity_scores_cache.get(
-                self._text, self._conversation_code
-            )
+            self._raw_scores = _polarity_scores_cache.get(self._text)
 
     def prevailing_sentiment(self) -> ScoredSentiment:
         return max(
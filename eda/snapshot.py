@@ -0,0 +1,517 @@
+import hashlib
+import json
+import math
+from collections import defaultdict
+from collections.abc import Callable, Iterable
+from functools import cached_property
+from pathlib import Path
+from typing import Any, Final, Optional
+
+import numpy as np
+import pandas as pd
+
+from eda.language import AttributedWord, TaggedText, jefferson_features_vocabulary
+from eda.models import (
+    PROSODIC_FEATURES,
+    Conversation,
+    ConversationLine,
+    MacroRegion,
+    Participant,
+    build_prosodic_table,
+    empty_prosodic_table,
+)
+from eda.tokens import build_token_table
+from eda.utils import FOLDER_DIR, KIPASTI_DATA_PATH, METADATA_PATH, atomic_writer
+
+SNAPSHOT_PATH = FOLDER_DIR / "snapshots" / "corpus.snapshot"
+
+# A snapshot is a single file made of the magic bytes, the length of a JSON
+# header, the header and then every array, each aligned so that it can be
+# memory-mapped in place. The header describes the arrays and holds the few
+# per-conversation values that are not worth an array, like the distinct
+# Jefferson feature masks, which can be wider than any integer array.
+_MAGIC: Final = b"GTSNAP\x00\x01"
+_FORMAT_VERSION: Final = 3
+_ALIGNMENT: Final = 64
+_HEADER_LENGTH_SIZE: Final = 8
+
+_SCORE_NAMES: Final = ("pos", "neg", "neu", "compound")
+_NO_STRING: Final = -1
+
+
+class _StringTable:
+    def __init__(self):
+        self._ids: dict[str, int] = {}
+        self._strings: list[str] = []
+
+    def id(self, value: object) -> int:
+        if not isinstance(value, str):
+            return _NO_STRING
+        if (string_id := self._ids.get(value)) is None:
+            self._ids[value] = string_id = len(self._strings)
+            self._strings.append(value)
+        return string_id
+
+    def arrays(self) -> dict[str, np.ndarray]:
+        # Offsets count characters rather than bytes, so the whole table can be
+        # decoded at once and sliced when loading
+        offsets = np.zeros(len(self._strings) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in self._strings], out=offsets[1:])
+        data = np.frombuffer("".join(self._strings).encode("utf-8"), dtype=np.uint8)
+        return {"string_data": data, "string_offsets": offsets}
+
+
+def sources_fingerprint(
+    data_path: Path = KIPASTI_DATA_PATH, metadata_path: Path = METADATA_PATH
+) -> str:
+    digest = hashlib.sha256()
+    paths = [*data_path.iterdir(), *metadata_path.glob("*.xlsx")]
+    for path in sorted(paths):
+        if path.name.startswith(".") or not path.is_file():
+            continue
+        stat = path.stat()
+        digest.update(f"{path.name}\0{stat.st_mtime_ns}\0{stat.st_size}\n".encode())
+    return digest.hexdigest()
+
+
+def save_snapshot(
+    conversations: Iterable[Conversation], fingerprint: str, path: Path = SNAPSHOT_PATH
+):
+    strings = _StringTable()
+    mask_ids: dict[int, int] = {}
+    columns: defaultdict[str, list] = defaultdict(list)
+    conversation_records = []
+
+    def mask_id(mask: int) -> int:
+        return mask_ids.setdefault(int(mask), len(mask_ids))
+
+    for conversation in conversations:
+        conversation_records.append({
+            "code": conversation.code,
+            "participants": [
+                participant.code for participant in conversation.participants
+            ],
+            "languages": sorted(conversation.languages),
+            "macro_region": conversation.macro_region.name,
+            "region": conversation.region,
+            "n_lines": len(conversation),
+            "n_tokens": len(conversation.tokens),
+            # Where the conversation starts in each array, so it can be read
+            # without reading the conversations before it
+            "line_start": len(columns["line_tu_id"]),
+            "word_start": len(columns["word_form"]),
+            "tag_start": len(columns["tag_fields"]),
+            "phrase_start": len(columns["phrases"]),
+            "token_start": len(columns["token_tu_id"]),
+        })
+
+        for line in conversation:
+            columns["line_tu_id"].append(line.tu_id)
+            columns["line_participant"].append(strings.id(line.participant.code))
+            columns["line_text"].append(strings.id(line.text))
+            columns["line_n_words"].append(len(line.normalised_words))
+            for word in line.normalised_words:
+                columns["word_form"].append(strings.id(str(word)))
+                columns["word_type"].append(strings.id(word.word_type))
+                columns["word_variation"].append(strings.id(word.variation))
+                columns["word_mask"].append(mask_id(word.jefferson_mask))
+
+            if line.has_loaded_tagged():
+                columns["line_n_tags"].append(len(line.tagged))
+                for tagged_word in line.tagged:
+                    columns["tag_fields"].append((
+                        strings.id(str(tagged_word)),
+                        strings.id(tagged_word.lemma),
+                        strings.id(tagged_word.pos),
+                        strings.id(tagged_word.entity_type),
+                    ))
+            else:
+                columns["line_n_tags"].append(-1)
+
+            scores = (
+                line.sentiments.loaded_scores if line.has_loaded_sentiments() else None
+            )
+            columns["line_scores"].append(
+                tuple(scores[name] for name in _SCORE_NAMES)
+                if scores is not None
+                else (math.nan,) * len(_SCORE_NAMES)
+            )
+
+            for name in PROSODIC_FEATURES:
+                if (phrases := vars(line).get(name)) is None:
+                    columns["line_n_phrases"].append(-1)
+                    continue
+                columns["line_n_phrases"].append(len(phrases))
+                columns["phrases"].extend(map(strings.id, phrases))
+
+        tokens = conversation.tokens
+        columns["token_tu_id"].extend(tokens["tu_id"].tolist())
+        columns["token_participant"].extend(
+            map(strings.id, tokens["participant_code"].tolist())
+        )
+        columns["token_form"].extend(map(strings.id, tokens["form"].tolist()))
+        columns["token_type"].extend(map(strings.id, tokens["type"].tolist()))
+        columns["token_variation"].extend(map(strings.id, tokens["variation"].tolist()))
+        columns["token_mask"].extend(map(mask_id, tokens["jefferson_mask"].tolist()))
+
+    arrays = {
+        "line_tu_id": np.array(columns["line_tu_id"], dtype=np.int64),
+        "line_participant": np.array(columns["line_participant"], dtype=np.int32),
+        "line_text": np.array(columns["line_text"], dtype=np.int32),
+        "line_n_words": np.array(columns["line_n_words"], dtype=np.int32),
+        "line_n_tags": np.array(columns["line_n_tags"], dtype=np.int32),
+        "line_scores": np.array(columns["line_scores"], dtype=np.float64).reshape(
+            -1, len(_SCORE_NAMES)
+        ),
+        "line_n_phrases": np.array(columns["line_n_phrases"], dtype=np.int32).reshape(
+            -1, len(PROSODIC_FEATURES)
+        ),
+        "phrases": np.array(columns["phrases"], dtype=np.int32),
+        "word_form": np.array(columns["word_form"], dtype=np.int32),
+        "word_type": np.array(columns["word_type"], dtype=np.int32),
+        "word_variation": np.array(columns["word_variation"], dtype=np.int32),
+        "word_mask": np.array(columns["word_mask"], dtype=np.int32),
+        "tag_fields": np.array(columns["tag_fields"], dtype=np.int32).reshape(-1, 4),
+        "token_tu_id": np.array(columns["token_tu_id"], dtype=np.int32),
+        "token_participant": np.array(columns["token_participant"], dtype=np.int32),
+        "token_form": np.array(columns["token_form"], dtype=np.int32),
+        "token_type": np.array(columns["token_type"], dtype=np.int32),
+        "token_variation": np.array(columns["token_variation"], dtype=np.int32),
+        "token_mask": np.array(columns["token_mask"], dtype=np.int32),
+        **strings.arrays(),
+    }
+    _write_snapshot(
+        path,
+        {
+            "version": _FORMAT_VERSION,
+            "fingerprint": fingerprint,
+            "jefferson_features": list(jefferson_features_vocabulary),
+            "jefferson_masks": list(mask_ids),
+            "conversations": conversation_records,
+        },
+        arrays,
+    )
+
+
+def load_snapshot(
+    participant_by_code: Callable[[str], Participant],
+    fingerprint: str,
+    path: Path = SNAPSHOT_PATH,
+) -> Optional[list[Conversation]]:
+    # Returns None when there is no snapshot, or when it was written by another
+    # format version or from other sources. Only the header is read here; the
+    # arrays stay memory-mapped until a conversation's lines, tokens or prosody
+    # are first used.
+    if (snapshot := _read_snapshot(path)) is None:
+        return None
+    header, arrays = snapshot
+    if header["version"] != _FORMAT_VERSION or header["fingerprint"] != fingerprint:
+        return None
+
+    snapshot_arrays = _SnapshotArrays(header, arrays, participant_by_code)
+    return [
+        _SnapshotConversation(
+            snapshot_arrays,
+            record,
+            [
+                participant_by_code(participant_code)
+                for participant_code in record["participants"]
+            ],
+        )
+        for record in header["conversations"]
+    ]
+
+
+class _SnapshotArrays:
+    # The arrays of a snapshot, with its strings and Jefferson masks decoded
+    # once, the first time a conversation needs them
+    def __init__(
+        self,
+        header: dict[str, Any],
+        arrays: dict[str, np.ndarray],
+        participant_by_code: Callable[[str], Participant],
+    ):
+        self._header = header
+        self._arrays = arrays
+        self._participant_by_code = participant_by_code
+
+    @cached_property
+    def strings(self) -> list[str]:
+        offsets = self._arrays["string_offsets"].tolist()
+        all_strings = self._arrays["string_data"].tobytes().decode("utf-8")
+        return [all_strings[start:end] for start, end in zip(offsets, offsets[1:])]
+
+    @cached_property
+    def jefferson_masks(self) -> list[int]:
+        return _remapped_jefferson_masks(
+            self._header["jefferson_features"], self._header["jefferson_masks"]
+        )
+
+    def string_at(self, string_id: int) -> Optional[str]:
+        return self.strings[string_id] if string_id != _NO_STRING else None
+
+    def value_at(self, string_id: int) -> str | float:
+        # Missing values are NaN, like in conversations read from the sources
+        return self.strings[string_id] if string_id != _NO_STRING else math.nan
+
+    def lines(self, record: dict[str, Any]) -> pd.Series:
+        arrays = self._arrays
+        strings = self.strings
+        line_slice = slice(
+            record["line_start"], record["line_start"] + record["n_lines"]
+        )
+        line_n_words = arrays["line_n_words"][line_slice].tolist()
+        line_n_tags = arrays["line_n_tags"][line_slice].tolist()
+        line_n_phrases = arrays["line_n_phrases"][line_slice].tolist()
+        line_scores = arrays["line_scores"][line_slice]
+
+        word_slice = slice(
+            record["word_start"], record["word_start"] + sum(line_n_words)
+        )
+        word_forms = arrays["word_form"][word_slice].tolist()
+        word_types = arrays["word_type"][word_slice].tolist()
+        word_variations = arrays["word_variation"][word_slice].tolist()
+        word_masks = arrays["word_mask"][word_slice].tolist()
+        n_tags = sum(n for n in line_n_tags if n > 0)
+        tag_fields = arrays["tag_fields"][
+            record["tag_start"] : record["tag_start"] + n_tags
+        ].tolist()
+        n_phrases = sum(n for counts in line_n_phrases for n in counts if n > 0)
+        phrases = arrays["phrases"][
+            record["phrase_start"] : record["phrase_start"] + n_phrases
+        ].tolist()
+
+        lines = []
+        word_index = tag_index = phrase_index = 0
+        for i, (tu_id, participant_id, text_id) in enumerate(
+            zip(
+                arrays["line_tu_id"][line_slice].tolist(),
+                arrays["line_participant"][line_slice].tolist(),
+                arrays["line_text"][line_slice].tolist(),
+                strict=True,
+            )
+        ):
+            n_words = line_n_words[i]
+            words = [
+                AttributedWord(
+                    strings[word_forms[j]],
+                    word_type=self.value_at(word_types[j]),
+                    jefferson_features=self.jefferson_masks[word_masks[j]],
+                    variation=self.value_at(word_variations[j]),
+                )
+                for j in range(word_index, word_index + n_words)
+            ]
+            word_index += n_words
+
+            line = ConversationLine(
+                record["code"],
+                tu_id,
+                self._participant_by_code(strings[participant_id]),
+                self.value_at(text_id),
+                words,
+            )
+
+            if (n_tags := line_n_tags[i]) >= 0:
+                line.tagged = [
+                    TaggedText(
+                        strings[text_id],
+                        strings[lemma_id],
+                        strings[pos_id],
+                        self.string_at(entity_id),
+                    )
+                    for text_id, lemma_id, pos_id, entity_id in tag_fields[
+                        tag_index : tag_index + n_tags
+                    ]
+                ]
+                tag_index += n_tags
+
+            scores = line_scores[i]
+            if not np.isnan(scores).any():
+                line.sentiments.restore_scores(
+                    dict(zip(_SCORE_NAMES, scores.tolist(), strict=True))
+                )
+
+            for name, n_phrases in zip(
+                PROSODIC_FEATURES, line_n_phrases[i], strict=True
+            ):
+                if n_phrases < 0:
+                    continue
+                setattr(
+                    line,
+                    name,
+                    tuple(
+                        strings[j]
+                        for j in phrases[phrase_index : phrase_index + n_phrases]
+                    ),
+                )
+                phrase_index += n_phrases
+
+            lines.append(line)
+        return pd.Series(lines)
+
+    def tokens(self, record: dict[str, Any]) -> pd.DataFrame:
+        arrays = self._arrays
+        token_slice = slice(
+            record["token_start"], record["token_start"] + record["n_tokens"]
+        )
+        return build_token_table(
+            record["code"],
+            tu_ids=np.asarray(arrays["token_tu_id"][token_slice]),
+            participant_codes=[
+                self.strings[i]
+                for i in arrays["token_participant"][token_slice].tolist()
+            ],
+            forms=[self.strings[i] for i in arrays["token_form"][token_slice].tolist()],
+            types=[
+                self.value_at(i) for i in arrays["token_type"][token_slice].tolist()
+            ],
+            variations=[
+                self.value_at(i)
+                for i in arrays["token_variation"][token_slice].tolist()
+            ],
+            jefferson_masks=[
+                self.jefferson_masks[mask]
+                for mask in arrays["token_mask"][token_slice].tolist()
+            ],
+        )
+
+    def prosody(self, record: dict[str, Any]) -> pd.DataFrame:
+        arrays = self._arrays
+        line_slice = slice(
+            record["line_start"], record["line_start"] + record["n_lines"]
+        )
+        n_phrases = arrays["line_n_phrases"][line_slice]
+        if not (n_phrases >= 0).all():
+            return empty_prosodic_table()
+        return build_prosodic_table(
+            record["code"],
+            tu_ids=np.asarray(arrays["line_tu_id"][line_slice]),
+            participant_codes=[
+                self.strings[i] for i in arrays["line_participant"][line_slice].tolist()
+            ],
+            counts=np.asarray(n_phrases),
+        )
+
+
+class _SnapshotConversation(Conversation):
+    # Its lines, tokens and prosody are built from the snapshot the first time
+    # they are used, and are then kept like those of any other conversation
+    def __init__(
+        self,
+        snapshot: _SnapshotArrays,
+        record: dict[str, Any],
+        participants: list[Participant],
+    ):
+        self._snapshot = snapshot
+        self._record = record
+        self._lines: Optional[pd.Series] = None
+        self._tokens: Optional[pd.DataFrame] = None
+        self._prosody: Optional[pd.DataFrame] = None
+        self.code = record["code"]
+        self.participants = participants
+        self.languages = frozenset(record["languages"])
+        self.macro_region = MacroRegion[record["macro_region"]]
+        self.region = record["region"]
+        self.__post_init__()
+
+    def __len__(self) -> int:
+        return self._record["n_lines"]
+
+    @property
+    def lines(self) -> pd.Series:
+        if self._lines is None:
+            self._lines = self._snapshot.lines(self._record)
+        return self._lines
+
+    @lines.setter
+    def lines(self, lines: pd.Series):
+        self._lines = lines
+
+    @property
+    def tokens(self) -> pd.DataFrame:
+        if self._tokens is None:
+            self._tokens = self._snapshot.tokens(self._record)
+        return self._tokens
+
+    @tokens.setter
+    def tokens(self, tokens: pd.DataFrame):
+        self._tokens = tokens
+
+    @property
+    def prosody(self) -> pd.DataFrame:
+        if self._prosody is None:
+            self._prosody = self._snapshot.prosody(self._record)
+        return self._prosody
+
+    @prosody.setter
+    def prosody(self, prosody: pd.DataFrame):
+        self._prosody = prosody
+
+
+def _remapped_jefferson_masks(feature_names: list[str], masks: list[int]) -> list[int]:
+    # Masks in the snapshot use the bit positions of the vocabulary of the
+    # process that saved it
+    return [
+        jefferson_features_vocabulary.encode(
+            name for i, name in enumerate(feature_names) if mask & (1 << i)
+        )
+        for mask in masks
+    ]
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // _ALIGNMENT) * _ALIGNMENT
+
+
+def _write_snapshot(path: Path, header: dict[str, Any], arrays: dict[str, np.ndarray]):
+    # Offsets are relative to the start of the data section, which directly
+    # follows the header, itself padded to the alignment
+    specs = {}
+    offset = 0
+    for name, array in arrays.items():
+        offset = _aligned(offset)
+        specs[name] = {"dtype": array.dtype.str, "shape": array.shape, "offset": offset}
+        offset += array.nbytes
+    raw_header = json.dumps({**header, "arrays": specs}).encode("utf-8")
+    data_start = _aligned(len(_MAGIC) + _HEADER_LENGTH_SIZE + len(raw_header))
+
+    with atomic_writer(path) as fp:
+        fp.write(_MAGIC)
+        fp.write(len(raw_header).to_bytes(_HEADER_LENGTH_SIZE, "little"))
+        fp.write(raw_header)
+        position = len(_MAGIC) + _HEADER_LENGTH_SIZE + len(raw_header)
+        for name, array in arrays.items():
+            start = data_start + specs[name]["offset"]
+            fp.write(b"\0" * (start - position))
+            fp.write(np.ascontiguousarray(array).tobytes())
+            position = start + array.nbytes
+
+
+def _read_snapshot(
+    path: Path,
+) -> Optional[tuple[dict[str, Any], dict[str, np.ndarray]]]:
+    if not path.exists():
+        return None
+
+    with path.open("rb") as fp:
+        if fp.read(len(_MAGIC)) != _MAGIC:
+            return None
+        header_length = int.from_bytes(fp.read(_HEADER_LENGTH_SIZE), "little")
+        header = json.loads(fp.read(header_length))
+
+    data_start = _aligned(len(_MAGIC) + _HEADER_LENGTH_SIZE + header_length)
+    arrays = {}
+    for name, spec in header.pop("arrays").items():
+        shape = tuple(spec["shape"])
+        if math.prod(shape) == 0:
+            arrays[name] = np.empty(shape, dtype=spec["dtype"])
+            continue
+        # Pages are shared read-only between every process loading the snapshot
+        arrays[name] = np.memmap(
+            path,
+            dtype=spec["dtype"],
+            mode="r",
+            offset=data_start + spec["offset"],
+            shape=shape,
+        )
+    return header, arrays
@@ -0,0 +1,376 @@
+import concurrent.futures
+import itertools
+import random
+from collections.abc import Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Final, Optional
+
+import pandas as pd
+
+# Roughly the size of the KIPasti corpus: conversations per macro region, and
+# transcribed turns per conversation
+KIPASTI_CONVERSATIONS: Final = {"NORD": 31, "CENTRO": 11, "SUD": 25}
+KIPASTI_LINES_PER_CONVERSATION: Final = 700
+
+_SHORT_MACRO_REGIONS: Final = {"NORD": "N", "CENTRO": "C", "SUD": "S"}
+_REGIONS: Final = {
+    "NORD": ("lombardia", "veneto", "emilia-romagna", "liguria"),
+    "CENTRO": ("toscana", "lazio", "marche", "umbria"),
+    "SUD": ("campania", "puglia", "calabria", "basilicata"),
+}
+# Origins only known from `Participants._add_regions_manual`
+_OTHER_ORIGINS: Final = ("piemonte", "sicilia", "friuli-venezia-giulia", "estero")
+# Every generation is covered, without the one range `Generation.classify`
+# can't place
+_AGE_RANGES: Final = (
+    "16-20",
+    "21-25",
+    "26-30",
+    "31-35",
+    "36-40",
+    "41-45",
+    "46-50",
+    "51-55",
+    "56-60",
+    "61-65",
+    "71-75",
+    "76-80",
+    "81-85",
+    "over 85",
+)
+_OCCUPATIONS: Final = (
+    "studente",
+    "impiegato",
+    "insegnante",
+    "pensionato",
+    "commerciante",
+    "operaio",
+    "libero professionista",
+)
+_DEGREES: Final = ("licenza media", "diploma", "laurea triennale", "laurea magistrale")
+_MOTHER_TONGUES: Final = ("italiano", "italiano", "italiano", "dialetto")
+
+_NON_SPEAKER: Final = "???"
+_NON_SPEAKER_RATE: Final = 0.02
+_MEAN_WORDS_PER_LINE: Final = 7
+_MAX_WORDS_PER_LINE: Final = 40
+_VARIATION_RATE: Final = 0.02
+# Words whose variation or Jefferson features are left empty, like a few rows
+# of the real files, so both parse paths see missing values
+_MISSING_VALUE_RATE: Final = 0.002
+
+# Words are drawn with Zipfian weights in this order, so fillers and short
+# replies repeat across lines like they do in real conversations
+_WORDS: Final = (
+    *("eh", "sì", "no", "mh", "ma", "e", "che", "non", "è", "la", "il", "di"),
+    *("okay", "allora", "cioè", "boh", "vabbè", "però", "poi", "perché", "io"),
+    *("ah", "comunque", "niente", "tipo", "proprio", "anche", "quindi", "ehm"),
+    *("mamma", "casa", "pasta", "pranzo", "cena", "vino", "nonna", "lavoro"),
+    *("bello", "buono", "buonissimo", "brutto", "stanco", "contento", "caldo"),
+    *("mangiare", "fare", "andare", "dire", "sapere", "vedere", "piacere"),
+    *("sugo", "pane", "formaggio", "dolce", "caffè", "domenica", "estate"),
+    *("scuola", "università", "esame", "treno", "macchina", "paese", "mare"),
+    *("weekend", "super", "top", "stress", "party", "cool", "happy", "sorry"),
+    *("love", "great", "bad", "sad", "fun", "nice", "wow", "like", "hate"),
+)
+_SHORTENINGS: Final = ("sto", "sta", "'na", "pe'", "'nsomma", "'sti", "co'")
+_DIALECT_WORDS: Final = (
+    *("mo", "uè", "jamme", "accussì", "chillo", "guaglione", "ciò", "bòn"),
+    *("bèla", "nisba", "daghe", "sciò", "ghe", "mizzica", "ammuccia", "toso"),
+)
+_UNKNOWN_WORD: Final = "xxx"
+
+
+@dataclass(frozen=True)
+class _WordKind:
+    word_type: str
+    is_dialect: bool = False
+
+
+_LINGUISTIC: Final = _WordKind("linguistic")
+_SHORTENING: Final = _WordKind("shortening")
+_DIALECT: Final = _WordKind("linguistic", is_dialect=True)
+_UNKNOWN: Final = _WordKind("unknown")
+
+_VOCABULARY: Final = (
+    *((word, _LINGUISTIC) for word in _WORDS),
+    *((word, _SHORTENING) for word in _SHORTENINGS),
+    *((word, _DIALECT) for word in _DIALECT_WORDS),
+    (_UNKNOWN_WORD, _UNKNOWN),
+)
+_CUMULATIVE_WEIGHTS: Final = tuple(
+    itertools.accumulate(1 / rank for rank in range(1, len(_VOCABULARY) + 1))
+)
+
+# Jefferson notation around runs of words: the marks that open and close a
+# run, and the feature given to its words in the .vert.tsv file
+_SPANS: Final = (
+    ("[", "]", "Overlap=Yes"),
+    (">", "<", "Pace=Fast"),
+    ("<", ">", "Pace=Slow"),
+    ("°", "°", "Volume=Low"),
+    ("", "", "Volume=High"),
+)
+_SPAN_RATE: Final = 0.3
+_MAX_SPAN_LENGTH: Final = 4
+# Marks ending an intonation unit, and how often each of them ends a line
+_INTONATIONS: Final = (
+    (".", "Intonation=Falling"),
+    ("?", "Intonation=Rising"),
+    (",", "Intonation=WeaklyRising"),
+)
+_LINE_ENDS: Final = (*_INTONATIONS, ("", None))
+_LINE_END_WEIGHTS: Final = (5, 3, 2, 4)
+_UNIT_END_RATE: Final = 0.08
+_PAUSE_RATE: Final = 0.05
+_PROLONGATION_RATE: Final = 0.04
+_PROSODIC_LINK_RATE: Final = 0.03
+_NO_ISO_CODE_RATE: Final = 0.6
+
+
+@dataclass(frozen=True)
+class SyntheticCorpus:
+    root: Path
+    n_conversations: int
+    n_participants: int
+    n_lines: int
+    n_words: int
+
+    def __str__(self) -> str:
+        return (
+            f"{self.root}: {self.n_conversations} conversations, "
+            f"{self.n_participants} participants, {self.n_lines} lines, "
+            f"{self.n_words} words"
+        )
+
+    @property
+    def metadata_path(self) -> Path:
+        return self.root / "metadata"
+
+    @property
+    def data_path(self) -> Path:
+        return self.root / "kipasti-data"
+
+
+@dataclass(frozen=True)
+class _ConversationPlan:
+    code: str
+    speakers: tuple[str, ...]
+    n_lines: int
+
+
+def write_synthetic_corpus(
+    root: Path,
+    scale: float = 1.0,
+    *,
+    lines_per_conversation: int = KIPASTI_LINES_PER_CONVERSATION,
+    seed: int = 0,
+    processes: bool = False,
+    max_workers: Optional[int] = None,
+) -> SyntheticCorpus:
+    # Writes a corpus laid out like `kiparla-data/`, with `scale` times as many
+    # conversations as KIPasti, for `Participants` and `Conversations` to read.
+    # Each conversation is generated from its own seed, so the files are the
+    # same whether or not they are written in processes.
+    corpus = SyntheticCorpus(root, 0, 0, 0, 0)
+    corpus.metadata_path.mkdir(parents=True, exist_ok=True)
+    corpus.data_path.mkdir(parents=True, exist_ok=True)
+    if any(corpus.data_path.glob("KP*")):
+        raise FileExistsError(f"Path {corpus.data_path} already contains conversations")
+
+    rng = random.Random(seed)
+    conversation_rows = []
+    participant_rows: dict[str, dict[str, str]] = {}
+    plans = []
+    for macro_region, n_real_conversations in KIPASTI_CONVERSATIONS.items():
+        previous_speakers: tuple[str, ...] = ()
+        for number in range(1, max(1, round(n_real_conversations * scale)) + 1):
+            code = f"KP{_SHORT_MACRO_REGIONS[macro_region]}{number:03d}"
+            region = rng.choice(_REGIONS[macro_region])
+            conversation_rows.append({
+                "code": code,
+                "languages": rng.choice(("italiano", "italiano-dialetto")),
+                "macro_region": macro_region,
+                "region": region,
+            })
+
+            speakers = []
+            for _ in range(rng.randint(2, 6)):
+                participant_code = f"PKP{len(participant_rows) + 1:03d}"
+                participant_rows[participant_code] = _participant_row(
+                    rng, participant_code, code, region
+                )
+                speakers.append(participant_code)
+            # Some participants take part in more than one conversation
+            if previous_speakers and rng.random() < 0.1:
+                participant_code = rng.choice(previous_speakers)
+                participant_rows[participant_code][
+                    "files in which participant appears"
+                ] += f", {code}"
+                speakers.append(participant_code)
+            previous_speakers = tuple(speakers)
+
+            n_lines = rng.randint(
+                lines_per_conversation // 2, lines_per_conversation * 3 // 2
+            )
+            plans.append(_ConversationPlan(code, tuple(speakers), n_lines))
+
+    pd.DataFrame(conversation_rows).to_excel(
+        corpus.metadata_path / "KIPasti_conversations.xlsx", index=False
+    )
+    pd.DataFrame(participant_rows.values()).to_excel(
+        corpus.metadata_path / "KIPasti_participants.xlsx", index=False
+    )
+
+    seeds = [f"{seed}:{plan.code}" for plan in plans]
+    if processes:
+        with concurrent.futures.ProcessPoolExecutor(max_workers) as executor:
+            counts = list(
+                executor.map(
+                    _write_conversation,
+                    itertools.repeat(corpus.data_path),
+                    plans,
+                    seeds,
+                    chunksize=8,
+                )
+            )
+    else:
+        counts = list(
+            map(_write_conversation, itertools.repeat(corpus.data_path), plans, seeds)
+        )
+
+    n_lines, n_words = map(sum, zip(*counts, strict=True))
+    return SyntheticCorpus(root, len(plans), len(participant_rows), n_lines, n_words)
+
+
+def _participant_row(
+    rng: random.Random, participant_code: str, conversation_code: str, region: str
+) -> dict[str, str]:
+    geographic_origin = rng.choice(_OTHER_ORIGINS) if rng.random() < 0.1 else region
+    return {
+        "participant code": participant_code,
+        "participant occupation": rng.choice(_OCCUPATIONS),
+        "participant sex": rng.choice(("F", "M")),
+        "files in which participant appears": conversation_code,
+        "participant geographic origin": geographic_origin,
+        "participant age range": rng.choice(_AGE_RANGES),
+        "participant degree": rng.choice(_DEGREES),
+        "mothertongue": rng.choice(_MOTHER_TONGUES),
+    }
+
+
+def _write_conversation(
+    data_path: Path, plan: _ConversationPlan, seed: str
+) -> tuple[int, int]:
+    rng = random.Random(seed)
+    kp_rows: dict[str, list] = {"tu_id": [], "speaker": [], "text": []}
+    vert_rows: dict[str, list] = {
+        "speaker": [],
+        "tu_id": [],
+        "form": [],
+        "type": [],
+        "variation": [],
+        "jefferson_feats": [],
+    }
+    speaker = rng.choice(plan.speakers)
+    n_words = 0
+    for tu_id in range(1, plan.n_lines + 1):
+        # Turns mostly pass to someone else
+        if len(plan.speakers) > 1 and rng.random() < 0.8:
+            speaker = rng.choice([code for code in plan.speakers if code != speaker])
+        line_speaker = _NON_SPEAKER if rng.random() < _NON_SPEAKER_RATE else speaker
+
+        words = rng.choices(
+            _VOCABULARY,
+            cum_weights=_CUMULATIVE_WEIGHTS,
+            k=min(
+                1 + int(rng.expovariate(1 / (_MEAN_WORDS_PER_LINE - 1))),
+                _MAX_WORDS_PER_LINE,
+            ),
+        )
+        text, features = _jefferson_line(rng, [form for form, _ in words])
+        kp_rows["tu_id"].append(tu_id)
+        kp_rows["speaker"].append(line_speaker)
+        kp_rows["text"].append(text)
+
+        for (form, kind), word_features in zip(words, features, strict=True):
+            variation: Optional[str] = "_"
+            if kind.is_dialect:
+                variation = rng.choice(("some", "all"))
+                if rng.random() < _NO_ISO_CODE_RATE:
+                    word_features.append("Language=NO_ISO_CODE")
+            raw_features: Optional[str] = "|".join(word_features) or "_"
+            if rng.random() < _MISSING_VALUE_RATE:
+                variation = None
+            if rng.random() < _MISSING_VALUE_RATE:
+                raw_features = None
+            _append_vert_row(
+                vert_rows,
+                line_speaker,
+                tu_id,
+                form,
+                kind.word_type,
+                variation,
+                raw_features,
+            )
+            # Alternative transcriptions of a word, which the parser skips
+            if rng.random() < _VARIATION_RATE:
+                _append_vert_row(
+                    vert_rows, "_", tu_id, f"{form}e", kind.word_type, "_", "_"
+                )
+        n_words += len(words)
+
+    pd.DataFrame(kp_rows).to_csv(data_path / f"{plan.code}.csv", sep="\t", index=False)
+    pd.DataFrame(vert_rows).to_csv(
+        data_path / f"{plan.code}.vert.tsv", sep="\t", index=False
+    )
+    return plan.n_lines, n_words
+
+
+def _append_vert_row(rows: dict[str, list], *values: object):
+    for column, value in zip(rows.values(), values, strict=True):
+        column.append(value)
+
+
+def _jefferson_line(
+    rng: random.Random, forms: Sequence[str]
+) -> tuple[str, list[list[str]]]:
+    # The transcribed text of a line, with the Jefferson features of each of its
+    # words
+    words = list(forms)
+    features: list[list[str]] = [[] for _ in forms]
+    for i, word in enumerate(words):
+        if rng.random() < _PROLONGATION_RATE:
+            words[i] = f"{word}{':' * rng.randint(1, 3)}"
+            features[i].append("Prolongation=Yes")
+
+    if rng.random() < _SPAN_RATE:
+        start = rng.randrange(len(words))
+        end = min(len(words), start + rng.randint(1, _MAX_SPAN_LENGTH))
+        opening, closing, feature = rng.choice(_SPANS)
+        for i in range(start, end):
+            features[i].append(feature)
+            if feature == "Volume=High":
+                words[i] = words[i].upper()
+        words[start] = f"{opening}{words[start]}"
+        words[end - 1] = f"{words[end - 1]}{closing}"
+
+    last = len(words) - 1
+    for i in range(len(words)):
+        if i == last:
+            mark, feature = rng.choices(_LINE_ENDS, weights=_LINE_END_WEIGHTS)[0]
+        elif rng.random() < _UNIT_END_RATE:
+            mark, feature = rng.choice(_INTONATIONS)
+        else:
+            continue
+        words[i] = f"{words[i]}{mark}"
+        if feature is not None:
+            features[i].append(feature)
+
+    for i in range(len(words)):
+        if rng.random() < _PROSODIC_LINK_RATE:
+            features[i].append("ProsodicLink=Yes")
+        if i > 0 and rng.random() < _PAUSE_RATE:
+            words[i] = f"(.) {words[i]}"
+    return " ".join(words), features
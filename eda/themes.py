@@ -0,0 +1,426 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+from collections import Counter
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Final, Optional
+
+from eda.chunking import (
+    DEFAULT_MAX_TOKENS,
+    ThemeChunk,
+    TokenCounter,
+    conversation_chunks,
+    estimate_tokens,
+    pack_chunks,
+    pack_text,
+)
+from eda.llm import DEFAULT_MODEL, MessageFactory, ModelResponseGenerator
+from eda.models import Conversation, Generation
+from eda.utils import FOLDER_DIR, PROMPTS_PATH, write_atomic
+
+THEMES_PATH = FOLDER_DIR / "themes"
+THEME_CHECKPOINTS_PATH = THEMES_PATH / "checkpoints.jsonl"
+THEMES_BY_CONVERSATION_PATH = FOLDER_DIR / "data" / "themes_by_generation.json"
+SPARQL_DATA_PATH = FOLDER_DIR / "data" / "sparql_data.json"
+
+GENERATION_ORDER: Final = (Generation.BOOMERS, Generation.X, Generation.Y, Generation.Z)
+
+type ThemesByConversation = dict[str, dict[str, Any]]
+type CheckpointKey = tuple[str, str, str, str]
+
+
+def load_lod_themes(path: Path = SPARQL_DATA_PATH) -> frozenset[str]:
+    sparql_data = json.loads(path.read_text())
+    return frozenset(map(str.title, sparql_data["conversation_types"]))
+
+
+def themes_prompt(themes: Iterable[str]) -> str:
+    prompt_text = PROMPTS_PATH.joinpath("themes_prompt.txt").read_text()
+    return prompt_text.replace("{themes}", ", ".join(themes))
+
+
+def classify_conversation_generation(conversation: Conversation) -> Generation:
+    generations = [participant.generation for participant in conversation.participants]
+    counts = Counter(generations)
+    most_common, count = counts.most_common(1)[0]
+    if count > len(generations) / 2:
+        return most_common
+    else:
+        return min(generations, key=GENERATION_ORDER.index)
+
+
+def themes_schema(themes: Iterable[str]) -> dict[str, Any]:
+    # The contract of `themes_prompt.txt`, as a JSON schema Ollama can
+    # constrain its output to
+    return {
+        "type": "object",
+        "properties": {
+            "applicable_themes": {
+                "type": "array",
+                "items": {"type": "string", "enum": sorted(themes)},
+            }
+        },
+        "required": ["applicable_themes"],
+    }
+
+
+def try_parse_themes(content: str, themes: frozenset[str]) -> Optional[list[str]]:
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError:
+        return None
+
+    if not isinstance(data, dict):
+        return None
+
+    if not isinstance(applicable_themes := data.get("applicable_themes"), list):
+        return None
+
+    return list(filter(themes.__contains__, applicable_themes))
+
+
+def repair_themes(content: str, themes: frozenset[str]) -> Optional[list[str]]:
+    # Recovers the themes from the near misses local models produce: prose or
+    # code fences around the object, single quotes, trailing commas, missing
+    # closing brackets, another key or a bare list, and themes in another case
+    text = _CODE_FENCE_PATTERN.sub("", content).strip()
+    if (start := _first_index(text, "{[")) is None:
+        return None
+    text = text[start:]
+    if (end := _last_index(text, "}]")) is not None and _is_balanced(text[: end + 1]):
+        text = text[: end + 1]
+
+    data = _loads_repaired(text)
+    if isinstance(data, dict):
+        data = data.get("applicable_themes", next(iter(data.values()), None))
+    if not isinstance(data, list):
+        return None
+
+    themes_by_folded_name = {theme.casefold(): theme for theme in themes}
+    return [
+        themes_by_folded_name[value.casefold()]
+        for value in data
+        if isinstance(value, str) and value.casefold() in themes_by_folded_name
+    ]
+
+
+_CODE_FENCE_PATTERN = re.compile(r"```(?:json)?")
+_TRAILING_COMMA_PATTERN = re.compile(r",\s*([\]}])")
+
+
+def _first_index(text: str, characters: str) -> Optional[int]:
+    indices = [i for c in characters if (i := text.find(c)) != -1]
+    return min(indices, default=None)
+
+
+def _last_index(text: str, characters: str) -> Optional[int]:
+    indices = [i for c in characters if (i := text.rfind(c)) != -1]
+    return max(indices, default=None)
+
+
+def _unclosed_brackets(text: str) -> list[str]:
+    closers = []
+    in_string = escaped = False
+    for c in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif c == "\\":
+                escaped = True
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = True
+        elif c in "{[":
+            closers.append("}" if c == "{" else "]")
+        elif c in "}]" and closers and closers[-1] == c:
+            closers.pop()
+    if in_string:
+        closers.append('"')
+    return closers
+
+
+def _is_balanced(text: str) -> bool:
+    return not _unclosed_brackets(text)
+
+
+def _loads_repaired(text: str) -> Any:
+    if '"' not in text:
+        text = text.replace("'", '"')
+    closers = _unclosed_brackets(text)
+    if '"' in closers:
+        # Cut off in the middle of a value, which can't be trusted
+        return None
+    text = text + "".join(reversed(closers))
+    text = _TRAILING_COMMA_PATTERN.sub(r"\1", text)
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return None
+
+
+def _hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode(encoding="utf-8")).hexdigest()
+
+
+class ThemeCheckpoints:
+    # Every answered (or given up on) chunk is appended to the log as soon as it
+    # is known, keyed by its conversation, its text, the prompt and the model, so
+    # an interrupted run loses at most the chunks that were in flight. Failed
+    # chunks are recorded with no themes and sent again by the next run.
+    def __init__(self, path: Path = THEME_CHECKPOINTS_PATH):
+        self._path = path
+        self._records: Optional[dict[CheckpointKey, dict[str, Any]]] = None
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    @staticmethod
+    def key(chunk: ThemeChunk, prompt_hash: str, model_name: str) -> CheckpointKey:
+        return (chunk.conversation_code, chunk.hash, prompt_hash, model_name)
+
+    def get(self, key: CheckpointKey) -> Optional[dict[str, Any]]:
+        return self._load().get(key)
+
+    def is_done(self, key: CheckpointKey) -> bool:
+        return (record := self.get(key)) is not None and record["themes"] is not None
+
+    def record(
+        self,
+        chunk: ThemeChunk,
+        prompt_hash: str,
+        model_name: str,
+        themes: Optional[list[str]],
+    ) -> dict[str, Any]:
+        record = {
+            "conversation_code": chunk.conversation_code,
+            "chunk_hash": chunk.hash,
+            "prompt_hash": prompt_hash,
+            "model": model_name,
+            "index": chunk.index,
+            "themes": themes,
+            "lemmas": list(chunk.lemmas),
+        }
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self._path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, (json.dumps(record, ensure_ascii=False) + "\n").encode())
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        self._load()[self.key(chunk, prompt_hash, model_name)] = record
+        return record
+
+    def _load(self) -> dict[CheckpointKey, dict[str, Any]]:
+        if self._records is not None:
+            return self._records
+
+        records = {}
+        if self._path.exists():
+            with self._path.open("r", encoding="utf-8") as log:
+                for raw_record in filter(str.strip, log):
+                    try:
+                        record = json.loads(raw_record)
+                    except json.JSONDecodeError:
+                        # Only a crash mid-write leaves a truncated record
+                        continue
+                    key = (
+                        record["conversation_code"],
+                        record["chunk_hash"],
+                        record["prompt_hash"],
+                        record["model"],
+                    )
+                    records[key] = record
+        self._records = records
+        return records
+
+
+@dataclass(frozen=True)
+class ThemesReport:
+    n_chunks: int
+    n_checkpointed: int
+    n_sent: int
+    n_failed: int
+    elapsed: float
+    # Every repaired response and every checkpointed chunk saved a request
+    n_valid: int = 0
+    n_repaired: int = 0
+    n_resent: int = 0
+    n_over_budget: int = 0
+    n_messages: int = 0
+
+    def __str__(self) -> str:
+        return (
+            f"Classified {self.n_chunks} chunks in {self.elapsed:.2f}s; "
+            f"{self.n_checkpointed} from checkpoints, {self.n_sent} sent in "
+            f"{self.n_messages} messages, "
+            f"{self.n_failed} failed; {self.n_valid} valid and "
+            f"{self.n_repaired} repaired responses, {self.n_resent} re-sent, "
+            f"{self.n_over_budget} over the retry budget"
+        )
+
+    @property
+    def n_saved_requests(self) -> int:
+        return self.n_checkpointed + self.n_repaired
+
+
+class _ThemesWriter:
+    # Rewrites an in-progress copy of the output after every answered chunk,
+    # with the values of every conversation in chunk order. The output itself
+    # is only replaced once the run is over and has themes, so an interrupted
+    # run leaves it as it was (its answered chunks are in the checkpoints).
+    def __init__(self, path: Path, conversations: Sequence[Conversation]):
+        self._path = path
+        self._in_progress_path = path.with_name(f"{path.stem}.in_progress{path.suffix}")
+        self._conversations = {
+            conversation.code: conversation for conversation in conversations
+        }
+        self._values: dict[str, dict[int, dict[str, Any]]] = {}
+
+    def add(self, record: dict[str, Any]):
+        self._values.setdefault(record["conversation_code"], {})[record["index"]] = {
+            "themes": record["themes"],
+            "lemmas": record["lemmas"],
+        }
+
+    def themes_by_conversation(self) -> ThemesByConversation:
+        return {
+            code: {
+                "generation": classify_conversation_generation(
+                    self._conversations[code]
+                ).name,
+                "values": [values[index] for index in sorted(values)],
+            }
+            for code, values in self._values.items()
+        }
+
+    def write(self):
+        self._write(self._in_progress_path)
+
+    def commit(self):
+        self._write(self._path)
+        self._in_progress_path.unlink(missing_ok=True)
+
+    def _write(self, path: Path):
+        if self._values:
+            write_atomic(path, json.dumps(self.themes_by_conversation(), indent=4))
+
+
+async def classify_themes(
+    conversations: Iterable[Conversation],
+    *,
+    prompt: str,
+    themes: Optional[frozenset[str]] = None,
+    model_name: str = DEFAULT_MODEL,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    count_tokens: TokenCounter = estimate_tokens,
+    merge_conversations: bool = False,
+    max_retries: int = 3,
+    retry_budget: Optional[int] = None,
+    structured: bool = True,
+    repair: bool = True,
+    checkpoints: Optional[ThemeCheckpoints] = None,
+    output_path: Path = THEMES_BY_CONVERSATION_PATH,
+    **generator_kwargs: Any,
+) -> ThemesReport:
+    start = time.perf_counter()
+    conversations = list(conversations)
+    themes = load_lod_themes() if themes is None else themes
+    checkpoints = ThemeCheckpoints() if checkpoints is None else checkpoints
+    prompt_hash = _hash_text(prompt)
+
+    writer = _ThemesWriter(output_path, conversations)
+    pending_chunks = []
+    n_chunks = 0
+    for conversation in conversations:
+        for chunk in conversation_chunks(
+            conversation, max_tokens, count_tokens=count_tokens
+        ):
+            n_chunks += 1
+            key = checkpoints.key(chunk, prompt_hash, model_name)
+            if checkpoints.is_done(key):
+                writer.add(checkpoints.get(key))
+            else:
+                pending_chunks.append(chunk)
+    writer.write()
+
+    # Responses are constrained to the schema of the prompt where the model
+    # supports it, and near misses are repaired locally; only chunks whose
+    # response can't be used are sent again, at most `max_retries` times each
+    # and `retry_budget` times in total
+    n_failed = n_valid = n_repaired = n_resent = n_over_budget = 0
+    packs = pack_chunks(
+        pending_chunks, max_tokens, merge_conversations=merge_conversations
+    )
+    factory = MessageFactory(prompt)
+    if structured:
+        generator_kwargs.setdefault("format", themes_schema(themes))
+    async with asyncio.TaskGroup() as task_group:
+        response_generator = ModelResponseGenerator(
+            model_name=model_name, **generator_kwargs
+        )
+        task_group.create_task(response_generator.run())
+
+        async def enqueue_chunks():
+            for pack in packs:
+                await response_generator.enqueue(
+                    factory.create_message(pack_text(pack), chunks=pack, retries=0)
+                )
+            await response_generator.enqueue(None)
+
+        task_group.create_task(enqueue_chunks())
+
+        async for response in response_generator:
+            pack = response.metadata["chunks"]
+            applicable_themes = None
+            if not response.failed:
+                applicable_themes = try_parse_themes(response.content, themes)
+                if applicable_themes is not None:
+                    n_valid += 1
+                elif repair:
+                    applicable_themes = repair_themes(response.content, themes)
+                    n_repaired += applicable_themes is not None
+
+            if applicable_themes is None:
+                response.metadata["retries"] += 1
+                can_retry = (
+                    not response.failed and response.metadata["retries"] < max_retries
+                )
+                if can_retry and (retry_budget is None or n_resent < retry_budget):
+                    n_resent += 1
+                    await response_generator.enqueue(response)
+                else:
+                    n_over_budget += can_retry
+                    response_generator.reject(response)
+                    n_failed += len(pack)
+                    for chunk in pack:
+                        checkpoints.record(chunk, prompt_hash, model_name, None)
+                continue
+
+            for chunk in pack:
+                writer.add(
+                    checkpoints.record(
+                        chunk, prompt_hash, model_name, applicable_themes
+                    )
+                )
+            writer.write()
+
+    writer.commit()
+    return ThemesReport(
+        n_chunks,
+        n_chunks - len(pending_chunks),
+        len(pending_chunks),
+        n_failed,
+        time.perf_counter() - start,
+        n_valid,
+        n_repaired,
+        n_resent,
+        n_over_budget,
+        len(packs),
+    )
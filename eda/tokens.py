@@ -0,0 +1,171 @@
+from collections.abc import Iterable, Sequence
+from typing import Final
+
+import numpy as np
+import pandas as pd
+
+from eda.language import (
+    DIALECT_VARIATIONS,
+    LINGUISTIC_WORD_TYPE,
+    NO_ISO_CODE_FEATURE,
+    jefferson_features_vocabulary,
+)
+
+# One row per token, in the order the tokens are spoken. It is a side table for
+# vectorized aggregates: lines keep their own words, which are still what the
+# notebooks and exports read, and the two are built from the same parse
+TOKEN_TABLE_DTYPES: Final = {
+    "conversation_code": "category",
+    "tu_id": np.int32,
+    "participant_code": "category",
+    "form": object,
+    "type": "category",
+    "variation": "category",
+    "jefferson_mask": np.uint64,
+    "is_linguistic": bool,
+    "is_dialect": bool,
+    "is_strict_dialect": bool,
+}
+
+_CATEGORICAL_COLUMNS: Final = tuple(
+    name for name, dtype in TOKEN_TABLE_DTYPES.items() if dtype == "category"
+)
+
+
+class TokenTableBuilder:
+    def __init__(self, conversation_code: str):
+        self._conversation_code = conversation_code
+        self._tu_ids: list[int] = []
+        self._participant_codes: list[str] = []
+        self._forms: list[str] = []
+        self._types: list[str] = []
+        self._variations: list[str] = []
+        self._jefferson_masks: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self._forms)
+
+    def append(
+        self,
+        tu_id: int,
+        participant_code: str,
+        form: str,
+        word_type: str,
+        variation: str,
+        jefferson_mask: int,
+    ):
+        self._tu_ids.append(tu_id)
+        self._participant_codes.append(participant_code)
+        self._forms.append(form)
+        self._types.append(word_type)
+        self._variations.append(variation)
+        self._jefferson_masks.append(jefferson_mask)
+
+    def build(self) -> pd.DataFrame:
+        return build_token_table(
+            self._conversation_code,
+            tu_ids=self._tu_ids,
+            participant_codes=self._participant_codes,
+            forms=self._forms,
+            types=self._types,
+            variations=self._variations,
+            jefferson_masks=self._jefferson_masks,
+        )
+
+
+def build_token_table(
+    conversation_code: str,
+    *,
+    tu_ids: Sequence[int] | np.ndarray,
+    participant_codes: Sequence[str] | np.ndarray,
+    forms: Sequence[str] | np.ndarray,
+    types: Sequence[str] | np.ndarray,
+    variations: Sequence[str] | np.ndarray,
+    jefferson_masks: Sequence[int] | np.ndarray,
+) -> pd.DataFrame:
+    jefferson_masks = jefferson_mask_array(jefferson_masks)
+    variations = pd.Series(variations, dtype="category")
+    types = pd.Series(types, dtype="category")
+
+    is_dialect = variations.isin(DIALECT_VARIATIONS).to_numpy()
+    has_no_iso_code = _has_bit(
+        jefferson_masks, jefferson_features_vocabulary.bit(NO_ISO_CODE_FEATURE)
+    )
+
+    return pd.DataFrame({
+        "conversation_code": pd.Categorical([conversation_code] * len(forms)),
+        "tu_id": np.asarray(tu_ids, dtype=np.int32),
+        "participant_code": pd.Categorical(participant_codes),
+        "form": np.asarray(forms, dtype=object),
+        "type": types.array,
+        "variation": variations.array,
+        "jefferson_mask": jefferson_masks,
+        "is_linguistic": (types == LINGUISTIC_WORD_TYPE).to_numpy(),
+        "is_dialect": is_dialect,
+        "is_strict_dialect": is_dialect & has_no_iso_code,
+    })
+
+
+def jefferson_mask_array(masks: Sequence[int] | np.ndarray) -> np.ndarray:
+    # Masks fit in unsigned 64-bit integers while the vocabulary has at most 64
+    # features, and are kept as Python integers beyond that
+    try:
+        return np.asarray(masks, dtype=np.uint64)
+    except OverflowError:
+        return np.asarray(masks, dtype=object)
+
+
+def _has_bit(masks: np.ndarray, bit: int) -> np.ndarray:
+    if masks.dtype == object:
+        return np.fromiter(
+            (int(mask) & bit != 0 for mask in masks), dtype=bool, count=len(masks)
+        )
+    if bit >> 64:
+        return np.zeros(len(masks), dtype=bool)
+    return (masks & np.uint64(bit)) != 0
+
+
+def empty_token_table() -> pd.DataFrame:
+    return pd.DataFrame({
+        name: pd.Series(dtype=dtype) for name, dtype in TOKEN_TABLE_DTYPES.items()
+    })
+
+
+def concat_token_tables(tables: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    tables = list(tables)
+    if not tables:
+        return empty_token_table()
+
+    # Categories differ between conversations, so concatenating them falls back
+    # to object columns; they are made categorical again over the union
+    table = pd.concat(tables, ignore_index=True)
+    for name in _CATEGORICAL_COLUMNS:
+        table[name] = table[name].astype("category")
+    return table
+
+
+def has_feature(table: pd.DataFrame, feature: str) -> pd.Series:
+    bit = jefferson_features_vocabulary.bit(feature)
+    return pd.Series(
+        _has_bit(table["jefferson_mask"].to_numpy(), bit), index=table.index
+    )
+
+
+def remap_jefferson_masks(
+    table: pd.DataFrame, feature_names: Sequence[str]
+) -> pd.DataFrame:
+    # Masks built in another process use the bit positions of that process'
+    # vocabulary, given by `feature_names`
+    if list(jefferson_features_vocabulary)[: len(feature_names)] == list(feature_names):
+        return table
+
+    masks = table["jefferson_mask"]
+    remapped_masks = {
+        mask: jefferson_features_vocabulary.encode(
+            name for i, name in enumerate(feature_names) if int(mask) & (1 << i)
+        )
+        for mask in masks.unique()
+    }
+    table = table.copy()
+    table["jefferson_mask"] = jefferson_mask_array(masks.map(remapped_masks).tolist())
+    return table
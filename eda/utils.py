@@ -1,8 +1,13 @@
+import hashlib
+import os
+import pickle
 import random
-from collections.abc import Callable, Iterator
+import tempfile
+from collections.abc import Callable, Generator, Iterator
+from contextlib import contextmanager
 from functools import partial
 from pathlib import Path
-from typing import Any
+from typing import Any, BinaryIO
 
 import pandas as pd
 
@@ -13,6 +18,8 @@ PROMPTS_PATH = FOLDER_DIR / "prompts"
 KIPASTI_DATA_PATH = KIPARLA_DATA_PATH / "kipasti-data"
 METADATA_PATH = KIPARLA_DATA_PATH / "metadata"
 
+_CACHED_FRAME_FORMAT_VERSION = 1
+
 
 def round_precise(value: float, n_digits: int = 2) -> int | float:
     exact_value = int(value)
@@ -61,3 +68,73 @@ def default_colours(n_colours: int, start: int = 0) -> list[str]:
 
 def human_name_from_snake_case(name: str) -> str:
     return " ".join(name.split("_")).capitalize()
+
+
+@contextmanager
+def atomic_writer(path: Path) -> Generator[BinaryIO]:
+    # The content is written to a temporary file next to `path` first, so
+    # readers never see a partially written file
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as fp:
+            yield fp
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        Path(temp_path).unlink(missing_ok=True)
+        raise
+
+
+def write_atomic(path: Path, content: str | bytes):
+    with atomic_writer(path) as fp:
+        fp.write(content.encode("utf-8") if isinstance(content, str) else content)
+
+
+def file_digest(path: Path) -> str:
+    with path.open("rb") as fp:
+        return hashlib.file_digest(fp, "sha256").hexdigest()
+
+
+def read_excel_cached(path: Path, **kwargs: Any) -> pd.DataFrame:
+    # Parsing .xlsx files is slow, so the parsed frame is pickled next to the
+    # source file. The pickle is reused while the source has the same mtime and
+    # size, or, failing that, the same content.
+    cache_path = path.with_name(f".{path.name}.pickle")
+    stat = path.stat()
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    options = repr(sorted(kwargs.items()))
+
+    cached = None
+    if cache_path.exists():
+        try:
+            with cache_path.open("rb") as fp:
+                cached = pickle.load(fp)
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            cached = None
+
+    if (
+        cached is not None
+        and cached["version"] == _CACHED_FRAME_FORMAT_VERSION
+        and cached["options"] == options
+    ):
+        if cached["stamp"] == stamp:
+            return cached["df"]
+        if cached["digest"] == (digest := file_digest(path)):
+            cached["stamp"] = stamp
+            write_atomic(cache_path, pickle.dumps(cached))
+            return cached["df"]
+    else:
+        digest = file_digest(path)
+
+    df = pd.read_excel(path, **kwargs)
+    cached = {
+        "version": _CACHED_FRAME_FORMAT_VERSION,
+        "options": options,
+        "stamp": stamp,
+        "digest": digest,
+        "df": df,
+    }
+    write_atomic(cache_path, pickle.dumps(cached, protocol=pickle.HIGHEST_PROTOCOL))
+    return df
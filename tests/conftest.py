@@ -0,0 +1,57 @@
+from collections.abc import Callable, Iterator
+from contextlib import ExitStack
+
+import pytest
+
+from eda.language import temporary_tag_caches
+from eda.llm import temporary_caches
+from eda.parsing import Conversations, Participants
+from eda.sentiments import temporary_polarity_scores
+from eda.synthetic import SyntheticCorpus, write_synthetic_corpus
+
+# A tenth of KIPasti with short conversations, big enough for regressions to
+# show while keeping a run of the suite short
+CORPUS_SCALE = 0.1
+CORPUS_LINES_PER_CONVERSATION = 150
+
+
+@pytest.fixture(scope="session")
+def corpus(tmp_path_factory: pytest.TempPathFactory) -> SyntheticCorpus:
+    return write_synthetic_corpus(
+        tmp_path_factory.mktemp("corpus"),
+        CORPUS_SCALE,
+        lines_per_conversation=CORPUS_LINES_PER_CONVERSATION,
+    )
+
+
+@pytest.fixture(scope="session")
+def participants(corpus: SyntheticCorpus) -> Participants:
+    return Participants(corpus.metadata_path)
+
+
+@pytest.fixture
+def read_conversations(
+    corpus: SyntheticCorpus, participants: Participants
+) -> Callable[[], Conversations]:
+    def read() -> Conversations:
+        conversations = Conversations(participants, corpus.data_path)
+        conversations.read_all()
+        return conversations
+
+    return read
+
+
+@pytest.fixture
+def empty_caches() -> Iterator[Callable[[], None]]:
+    # Swaps every cache for an empty one for the whole test, and again each
+    # time the returned function is called, so every benchmark round starts
+    # cold and nothing reaches the real caches
+    with ExitStack() as stack:
+
+        def empty():
+            stack.enter_context(temporary_tag_caches())
+            stack.enter_context(temporary_polarity_scores())
+            stack.enter_context(temporary_caches())
+
+        empty()
+        yield empty
@@ -0,0 +1,88 @@
+# Times every stage of the pipeline over a synthetic corpus. Save a baseline
+# with `pytest --benchmark-autosave`, then catch regressions against it with
+# `pytest --benchmark-compare --benchmark-compare-fail=mean:25%`.
+import importlib.util
+from collections.abc import Callable
+from pathlib import Path
+
+import pytest
+
+from eda.benchmarks import export_tables
+from eda.models import ConversationLine, normalise_lines, score_lines, tag_lines
+from eda.parsing import Conversations, Participants
+from eda.sentiments import ScoringBackend
+from eda.synthetic import SyntheticCorpus
+
+ROUNDS = 3
+
+type ReadConversations = Callable[[], Conversations]
+
+
+def _lines(conversations: Conversations) -> list[ConversationLine]:
+    return [line for conversation in conversations for line in conversation]
+
+
+def test_parse(
+    benchmark, corpus: SyntheticCorpus, participants: Participants, empty_caches
+):
+    def setup():
+        return (Conversations(participants, corpus.data_path),), {}
+
+    report = benchmark.pedantic(
+        lambda conversations: conversations.read_all(), setup=setup, rounds=ROUNDS
+    )
+    assert report.scoring is None and report.tagging is None
+
+
+def test_normalisation(benchmark, read_conversations: ReadConversations, empty_caches):
+    def setup():
+        return (_lines(read_conversations()),), {}
+
+    benchmark.pedantic(normalise_lines, setup=setup, rounds=ROUNDS)
+
+
+def test_sentiment(benchmark, read_conversations: ReadConversations, empty_caches):
+    def setup():
+        empty_caches()
+        return (_lines(read_conversations()),), {"backend": ScoringBackend.LEXICON}
+
+    report = benchmark.pedantic(score_lines, setup=setup, rounds=ROUNDS)
+    assert report.n_lines > 0
+
+
+@pytest.mark.skipif(
+    importlib.util.find_spec("it_core_news_sm") is None,
+    reason="The Italian spaCy model is not installed",
+)
+def test_tagging(benchmark, read_conversations: ReadConversations, empty_caches):
+    def setup():
+        empty_caches()
+        return (_lines(read_conversations()),), {}
+
+    report = benchmark.pedantic(tag_lines, setup=setup, rounds=ROUNDS)
+    assert report.n_lines > 0
+
+
+def test_prosody(benchmark, read_conversations: ReadConversations, empty_caches):
+    def setup():
+        return (read_conversations(),), {}
+
+    def load_prosodic(conversations: Conversations):
+        for conversation in conversations:
+            conversation.load_prosodic()
+
+    benchmark.pedantic(load_prosodic, setup=setup, rounds=ROUNDS)
+
+
+def test_export(
+    benchmark, read_conversations: ReadConversations, empty_caches, tmp_path: Path
+):
+    conversations = read_conversations()
+    for conversation in conversations:
+        conversation.load_prosodic()
+
+    benchmark.pedantic(export_tables, args=(conversations, tmp_path), rounds=ROUNDS)
+    assert {path.name for path in tmp_path.iterdir()} == {
+        "dialect_word_counts.json",
+        "prosodic_frequencies.json",
+    }
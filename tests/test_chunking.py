@@ -0,0 +1,24 @@
+from types import SimpleNamespace
+from typing import cast
+
+from eda.chunking import _line_words_and_lemmas
+from eda.language import TaggedText
+from eda.models import ConversationLine
+
+
+def test_lemmas_stay_with_their_words():
+    # "a" is in "casa" and "lavoro" in "lavorone", which must not draw their
+    # tags (or the tags after them) to the wrong words
+    line = SimpleNamespace(
+        normalised_words=["casa", "lavorone", "a", "l'acqua", "lavoro", "boh"],
+        tagged=[
+            TaggedText("casa", "casa", "NOUN"),
+            TaggedText("a", "a", "ADP"),
+            TaggedText("acqua", "acqua", "NOUN"),
+            TaggedText("lavoro", "lavoro", "NOUN"),
+            TaggedText("bo", "bo", "INTJ"),
+        ],
+    )
+    words, lemmas = _line_words_and_lemmas(cast(ConversationLine, line))
+    assert words == ["casa", "lavorone", "a", "l'acqua", "lavoro", "boh"]
+    assert lemmas == [["casa"], [], ["a"], ["acqua"], ["lavoro", "bo"], []]
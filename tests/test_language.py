@@ -0,0 +1,33 @@
+import importlib.util
+from collections.abc import Callable
+
+import pytest
+
+from eda.language import _TagCache
+from eda.parsing import Conversations
+
+
+@pytest.mark.skipif(
+    importlib.util.find_spec("it_core_news_sm") is None,
+    reason="The spaCy model is not installed",
+)
+def test_tag_cache_is_written_once_per_read(
+    read_conversations: Callable[[], Conversations],
+    empty_caches: Callable[[], None],
+    monkeypatch: pytest.MonkeyPatch,
+):
+    # Every write rewrites the whole cache, so tagging conversation by
+    # conversation mustn't write it each time
+    writes = []
+    flush = _TagCache.flush
+    monkeypatch.setattr(
+        _TagCache, "flush", lambda tag_cache: writes.append(flush(tag_cache))
+    )
+
+    conversations = read_conversations()
+    for conversation in list(conversations)[:3]:
+        conversation.load_tagged()
+    assert not writes
+
+    conversations.read_all(load_tagged=True)
+    assert len(writes) == 1
@@ -0,0 +1,22 @@
+import pytest
+
+from eda.benchmarks import benchmark_conversation_parsing
+from eda.parsing import ConversationParser, Conversations, Participants
+from eda.synthetic import SyntheticCorpus
+
+
+def test_read_all_in_processes_rejects_parallel(
+    corpus: SyntheticCorpus, participants: Participants
+):
+    conversations = Conversations(participants, corpus.data_path)
+    with pytest.raises(ValueError):
+        conversations.read_all(parallel=True, processes=True)
+
+
+def test_parse_paths_agree(corpus: SyntheticCorpus, participants: Participants):
+    # Raises if the row-by-row and vectorized parses differ
+    codes = ConversationParser(participants, corpus.data_path).conversation_codes()
+    results = benchmark_conversation_parsing(
+        participants, list(codes), corpus.data_path
+    )
+    assert len(results) == 2
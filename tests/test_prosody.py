@@ -0,0 +1,82 @@
+from collections import Counter, defaultdict
+
+import pytest
+
+from eda.models import PROSODIC_FEATURES, Participant, score_lines
+from eda.parsing import Conversations, Participants
+from eda.sentiments import ScoringBackend
+from eda.synthetic import SyntheticCorpus, write_synthetic_corpus
+
+
+@pytest.fixture(scope="module")
+def shared_speakers_corpus(tmp_path_factory: pytest.TempPathFactory) -> SyntheticCorpus:
+    # Enough short conversations for some participants to speak in more than
+    # one of them
+    return write_synthetic_corpus(
+        tmp_path_factory.mktemp("corpus"), 0.5, lines_per_conversation=40
+    )
+
+
+def _notebook_prosodic_frequencies(
+    conversations: Conversations, participants: Participants
+) -> dict[str, dict[str, float]]:
+    # The per-participant loop the prosodic features export used before
+    # `Conversations.prosodic_frequencies`
+    def participant_frequencies(participant: Participant) -> dict[str, float]:
+        participant_data = defaultdict(int)
+        n_lines = 0
+        for line in conversations.participant_lines(participant):
+            for name, value in vars(line).items():
+                if name.endswith("phrases") and name != "overlapping_phrases":
+                    participant_data[name] += len(value)
+            n_lines += 1
+        return {key: value / n_lines * 100 for key, value in participant_data.items()}
+
+    frequencies_by_generation = defaultdict(list)
+    for participant in participants:
+        frequencies_by_generation[participant.generation.name].append(
+            participant_frequencies(participant)
+        )
+
+    result = {}
+    for generation, all_frequencies in frequencies_by_generation.items():
+        total_counts = Counter()
+        for frequencies in all_frequencies:
+            total_counts += Counter(frequencies)
+        result[generation] = {
+            feature: count / len(all_frequencies)
+            for feature, count in total_counts.items()
+        }
+    return result
+
+
+def test_prosodic_frequencies_match_the_notebook_export(
+    shared_speakers_corpus: SyntheticCorpus, empty_caches
+):
+    participants = Participants(shared_speakers_corpus.metadata_path)
+    conversations = Conversations(participants, shared_speakers_corpus.data_path)
+    conversations.read_all(load_prosodic=True)
+    score_lines(
+        [line for conversation in conversations for line in conversation],
+        backend=ScoringBackend.LEXICON,
+    )
+    # Only meaningful when some participants speak in other conversations than
+    # their own
+    participant_codes = {participant.code for participant in participants}
+    assert any(
+        line.participant.conversation_code != conversation.code
+        for conversation in conversations
+        for line in conversation
+        if line.participant.code in participant_codes
+    )
+
+    features = [name for name in PROSODIC_FEATURES if name != "overlapping_phrases"]
+    frequencies = conversations.prosodic_frequencies(
+        by="generation", features=features, valid_sentiments=True
+    )
+    expected = _notebook_prosodic_frequencies(conversations, participants)
+    assert set(frequencies.index) == set(expected)
+    for generation, generation_frequencies in frequencies.iterrows():
+        assert generation_frequencies.to_dict() == pytest.approx({
+            feature: expected[generation].get(feature, 0.0) for feature in features
+        })
@@ -0,0 +1,73 @@
+import importlib.metadata
+import random
+
+import pytest
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+
+from eda.sentiments import SPECIAL_CASES, LexiconScorer
+
+
+def _installed_version(distribution: str) -> str | None:
+    try:
+        return importlib.metadata.version(distribution)
+    except importlib.metadata.PackageNotFoundError:
+        return None
+
+
+# vader_multi installs its own `vaderSentiment` module, which translates texts
+# before scoring them and that the lexicon scorer doesn't reproduce
+pytestmark = pytest.mark.skipif(
+    _installed_version("vader_multi") is not None
+    or _installed_version("vaderSentiment") != "3.3.2",
+    reason="The lexicon scorer reproduces vaderSentiment 3.3.2 only",
+)
+
+_WORDS = (
+    *("good", "bad", "love", "hate", "happy", "sad", "great", "awful", "nice"),
+    *("okay", "fine", "hope", "fun", "kill", "like", "lol", "no", "yes"),
+    *("casa", "pasta", "mamma", "allora", "boh", "eh", "the", "a", "is", "it"),
+)
+_BOOSTERS = (
+    *("very", "extremely", "barely", "hardly", "really", "so", "totally"),
+    *("kind of", "sort of", "kinda", "less", "most", "slightly"),
+)
+_NEGATIONS = ("not", "isn't", "never", "without", "nor", "or", "doesn't", "don't")
+_RARE_RULES = ("but", "BUT", "least", "at least", "doubt", "this", "without doubt")
+_CAPS = ("GOOD", "LOVE", "HATE", "BAD", "GREAT", "OK", "I")
+_EMOJIS = ("😀", "😢", "😡", "👍", "❤", "❤️", "🙂", ":)", ":(", ":D", "<3", ":-/")
+_PUNCTUATION = ("!", "!!", "!!!!!", "?", "??", "???!", ".", "...", ",", "'")
+_IDIOMS = tuple(SPECIAL_CASES) + (
+    *("yeah right", "kiss of death", "cut the mustard", "hand to mouth"),
+    *("the bomb", "bad ass", "the shit", "back handed", "upper hand"),
+)
+
+
+def _fuzzed_text(rng: random.Random) -> str:
+    tokens = []
+    for _ in range(rng.randint(0, 14)):
+        pool = rng.choices(
+            (_WORDS, _BOOSTERS, _NEGATIONS, _RARE_RULES, _CAPS, _EMOJIS, _IDIOMS),
+            weights=(10, 3, 3, 1, 1, 1, 1),
+        )[0]
+        token = rng.choice(pool)
+        if rng.random() < 0.15:
+            token += rng.choice(_PUNCTUATION)
+        if rng.random() < 0.05:
+            token = rng.choice(_PUNCTUATION) + token
+        tokens.append(token)
+    if rng.random() < 0.3:
+        tokens.append(rng.choice(_PUNCTUATION))
+    return " ".join(tokens)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_lexicon_scorer_matches_vader(seed: int):
+    rng = random.Random(seed)
+    texts = [_fuzzed_text(rng) for _ in range(2000)]
+    analyser = SentimentIntensityAnalyzer()
+    mismatches = [
+        (text, scores, expected_scores)
+        for text, scores in zip(texts, LexiconScorer(analyser)(texts), strict=True)
+        if scores != (expected_scores := analyser.polarity_scores(text))
+    ]
+    assert not mismatches, mismatches[:5]